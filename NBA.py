@@ -1,19 +1,21 @@
 import os
 import re
 import subprocess
-import json
 import random
 import praw
 import yt_dlp
-import requests
 import logging
 import time
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from sheets_client import add_video_to_sheet
+from google_clients import get_drive_service
+from drive_uploader import upload_file, report_dedup
+from drive_index import get_drive_index
+from sheets_client import add_video_to_sheet, flush_sheet_rows
+from quality_gate import check_clip_quality, trim_args
+from captions import CAPTION_PREFETCH, caption_one, generate_captions, headline_spec, report_caption_cache
+from video_fingerprint import check_duplicate, register_upload
 
 # ------------------ Logging Setup ------------------
 logging.basicConfig(
@@ -39,34 +41,16 @@ if missing:
 
 # ------------------ Google Drive Integration ------------------
 SCOPES = ['https://www.googleapis.com/auth/drive']
-SERVICE_ACCOUNT_INFO = json.loads(os.environ['GDRIVE_SERVICE_ACCOUNT'])
-
 def authenticate_drive():
-    creds = service_account.Credentials.from_service_account_info(
-        SERVICE_ACCOUNT_INFO, scopes=SCOPES
-    )
-    return build('drive', 'v3', credentials=creds)
+    return get_drive_service(SCOPES)
 
 def get_or_create_folder(drive_service, folder_name):
-    q = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-    res = drive_service.files().list(q=q, fields="files(id)").execute()
-    items = res.get('files', [])
-    if items:
-        return items[0]['id']
-    folder = drive_service.files().create(
-        body={'name': folder_name, 'mimeType': 'application/vnd.google-apps.folder'},
-        fields='id'
-    ).execute()
-    return folder['id']
+    return get_drive_index(drive_service).get_or_create_folder(folder_name)
 
 def upload_to_drive(drive_service, folder_id, file_path):
     name = os.path.basename(file_path)
-    media = MediaFileUpload(file_path)
     try:
-        drive_service.files().create(
-            body={'name': name, 'parents': [folder_id]},
-            media_body=media
-        ).execute()
+        upload_file(drive_service, file_path, folder_id)
         print(f"Uploaded {name} to Google Drive")
     except Exception as e:
         print(f"❌ Google Drive upload failed: {e}")
@@ -180,7 +164,7 @@ def download_video(url):
 
 MAX_PROCESS_SECONDS = 600  # 10 minutes in seconds
 
-def process_video_with_background(input_mp4, output_mp4, mode):
+def process_video_with_background(input_mp4, output_mp4, mode, trim=None):
     print(f"🎨 Processing with background mode: {mode}")
     
     if mode == "black":
@@ -199,7 +183,7 @@ def process_video_with_background(input_mp4, output_mp4, mode):
         filter_vf = "scale=1080:-1:force_original_aspect_ratio=decrease,pad=1080:1920:(ow-iw)/2:(oh-ih)/2"
     
     cmd = [
-        'ffmpeg', '-y', '-i', input_mp4,
+        'ffmpeg', '-y', *trim_args(trim), '-i', input_mp4,
         '-vf', filter_vf,
         '-c:v', 'libx264', '-preset', 'fast', '-crf', '23',
         '-c:a', 'aac', output_mp4
@@ -219,51 +203,14 @@ def process_video_with_background(input_mp4, output_mp4, mode):
         safe_cleanup(output_mp4)
         raise
 
+HEADLINE_SPEC = headline_spec("NBA", fallback=lambda post_title: sanitize_filename(post_title)[:100])
+
 def generate_headline(post_title):
-    try:
-        truncated_title = post_title[:200]
-        prompt = (
-            "Rewrite the following Reddit NBA highlight as a short, catchy, viral TikTok caption.\n"
-            "Rules:\n"
-            "- Use at most 2 relevant emojis.\n"
-            "- No hashtags anywhere.\n"
-            "- Keep the caption under 200 characters.\n"
-            "- Make the caption short, natural, and exciting—summarize the moment.\n"
-            "- Output ONLY the TikTok caption, and nothing else (no intro, formatting, or explanation).\n\n"
-            f"Reddit title:\n{truncated_title}\n\n"
-            "TikTok caption:"
-        )
-        headers = {
-            "Authorization": f"Bearer {os.environ['OPENROUTER_API_KEY']}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": "meta-llama/llama-3.3-70b-instruct:free",
-            "messages": [{
-                "role": "system",
-                "content": (
-                    "You are a social media expert specializing in creating viral, concise TikTok captions from NBA highlight titles. "
-                    "Always obey all instructions precisely and never go over 200 characters."
-                )
-            }, {
-                "role": "user",
-                "content": prompt
-            }],
-            "max_tokens": 500,
-            "temperature": 0.85
-        }
-        response = requests.post("https://openrouter.ai/api/v1/chat/completions", json=payload, headers=headers, timeout=20)
-        response.raise_for_status()
-        content = response.json()['choices'][0]['message']['content'].strip()
-        caption = content.split('\n')[0].replace('_VERTICAL.mp4', '')
-        caption = re.sub(r'#\w+', '', caption)
-        caption = caption.strip()
-        if len(caption) > 200:
-            caption = caption[:197] + "..."
-        return caption
-    except Exception as e:
-        print(f"⚠️ Headline generation failed: {str(e)}")
-        return sanitize_filename(post_title)[:100]
+    return caption_one(post_title, HEADLINE_SPEC)
+
+def generate_headlines(post_titles):
+    """Caption a whole run's titles in about one round trip"""
+    return generate_captions(post_titles, HEADLINE_SPEC)
 
 # ------------------ Main Process ------------------
 reddit = praw.Reddit(
@@ -290,74 +237,100 @@ if __name__ == "__main__":
     ]
     print(f"Found {len(posts)} potential posts with video URLs.")
 
-    for post in posts:
-        if processed >= MAX_VIDEOS:
-            break
-
-        print(f"Examining post: {post.title[:60]} | URL: {post.url}")
-
-        # Download video with backoff/retries
-        path = download_video(post.url)
-        if not path or not os.path.isfile(path):
-            print(f"⏭️ SKIP: Could not download video for {post.url}")
-            continue
-
-        true_dur = get_true_duration(path)
-        print(f"🕒 CHECK: Downloaded video duration = {true_dur:.2f} sec for post '{post.title[:60]}'")
-        if not (MIN_SECONDS <= true_dur <= MAX_SECONDS):
-            print(f"⏭️ SKIP: Removing video '{path}' with duration {true_dur:.2f} sec (⛔ not in range {MIN_SECONDS}-{MAX_SECONDS}s).")
-            safe_cleanup(path)
-            continue
+    # Caption the first candidates in the background while videos download;
+    # anything past the prefetch window is captioned on demand
+    caption_pool = ThreadPoolExecutor(max_workers=1)
+    headlines_future = caption_pool.submit(generate_headlines, [post.title for post in posts[:CAPTION_PREFETCH]])
 
-        print(f"✅ PROCESS: {post.url} (duration={true_dur:.2f}s, proceeding!)")
-        bg_mode = pick_background_type()
+    try:
+        for post in posts:
+            if processed >= MAX_VIDEOS:
+                break
+
+            print(f"Examining post: {post.title[:60]} | URL: {post.url}")
+
+            # Download video with backoff/retries
+            path = download_video(post.url)
+            if not path or not os.path.isfile(path):
+                print(f"⏭️ SKIP: Could not download video for {post.url}")
+                continue
+
+            true_dur = get_true_duration(path)
+            print(f"🕒 CHECK: Downloaded video duration = {true_dur:.2f} sec for post '{post.title[:60]}'")
+            if not (MIN_SECONDS <= true_dur <= MAX_SECONDS):
+                print(f"⏭️ SKIP: Removing video '{path}' with duration {true_dur:.2f} sec (⛔ not in range {MIN_SECONDS}-{MAX_SECONDS}s).")
+                safe_cleanup(path)
+                continue
+
+            quality = check_clip_quality(path, profile='nba')
+            if not quality['passed']:
+                print(f"⏭️ SKIP: Quality gate rejected '{path}': {quality['reason']}")
+                safe_cleanup(path)
+                continue
+            if quality['trim']:
+                print(f"✂️ Trimming dead air: keeping {quality['trim'][0]:.2f}-{quality['trim'][1]:.2f}s")
+
+            fingerprint, duplicate = check_duplicate(path)
+            if duplicate:
+                print(f"⏭️ SKIP: '{path}' was already uploaded as '{duplicate['name']}'.")
+                safe_cleanup(path)
+                continue
+
+            print(f"✅ PROCESS: {post.url} (duration={true_dur:.2f}s, proceeding!)")
+            bg_mode = pick_background_type()
         
-        print(f"🎲 Selected background mode: {bg_mode}")
+            print(f"🎲 Selected background mode: {bg_mode}")
         
-        final_vid = path.replace(".mp4", "_VERTICAL.mp4")
+            final_vid = path.replace(".mp4", "_VERTICAL.mp4")
+
+            try:
+                process_video_with_background(
+                    input_mp4=path,
+                    output_mp4=final_vid,
+                    mode=bg_mode,
+                    trim=quality['trim']
+                )
+            except subprocess.TimeoutExpired:
+                print(f"⏭️ SKIP: Video processing killed due to excess runtime. Removing and proceeding to next video.")
+                safe_cleanup(path, final_vid)
+                continue
+            except Exception as e:
+                print(f"⏭️ SKIP: Video processing failed. {e}")
+                safe_cleanup(path, final_vid)
+                continue
 
-        try:
-            process_video_with_background(
-                input_mp4=path,
-                output_mp4=final_vid,
-                mode=bg_mode
-            )
-        except subprocess.TimeoutExpired:
-            print(f"⏭️ SKIP: Video processing killed due to excess runtime. Removing and proceeding to next video.")
-            safe_cleanup(path, final_vid)
-            continue
-        except Exception as e:
-            print(f"⏭️ SKIP: Video processing failed. {e}")
-            safe_cleanup(path, final_vid)
-            continue
-
-        safe_cleanup(path)
-
-        headline = sanitize_filename(generate_headline(post.title))
-        final = f"{headline}.mp4"
-        try:
-            os.rename(final_vid, final)
-        except Exception as e:
-            print(f"⚠️ Rename failed: {e}")
-            safe_cleanup(final_vid)
-            continue
-
-        # Attempt upload and logging; ensure cleanup on failure
-        try:
-            upload_to_drive(drive, folder_id, final)
-            add_video_to_sheet(
-                source="NBA",
-                reddit_url=post.url,
-                reddit_caption=post.title,
-                drive_video_name=headline
-            )
-        except Exception as e:
-            print(f"⚠️ Failed to add data to Google Sheet or upload to Drive: {e}")
-            safe_cleanup(final)
-            continue
+            safe_cleanup(path)
 
-        safe_cleanup(final)
-        processed += 1
-        print(f"✅ Processed: {headline}")
+            headline = sanitize_filename(headlines_future.result().get(post.title) or generate_headline(post.title))
+            final = f"{headline}.mp4"
+            try:
+                os.rename(final_vid, final)
+            except Exception as e:
+                print(f"⚠️ Rename failed: {e}")
+                safe_cleanup(final_vid)
+                continue
+
+            # Attempt upload and logging; ensure cleanup on failure
+            try:
+                upload_to_drive(drive, folder_id, final)
+                register_upload(fingerprint, "NBA", headline)
+                add_video_to_sheet(
+                    source="NBA",
+                    reddit_url=post.url,
+                    reddit_caption=post.title,
+                    drive_video_name=headline
+                )
+            except Exception as e:
+                print(f"⚠️ Failed to add data to Google Sheet or upload to Drive: {e}")
+                safe_cleanup(final)
+                continue
 
+            safe_cleanup(final)
+            processed += 1
+            print(f"✅ Processed: {headline}")
+    finally:
+        caption_pool.shutdown()
+        flush_sheet_rows()
+    report_caption_cache()
+    report_dedup()
     print("All done, finished scanning posts!")
@@ -1,44 +1,28 @@
 import os
 import re
 import subprocess
-import json
 import praw
 import yt_dlp
-import requests
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from sheets_client import add_video_to_sheet # <-- Import the new function
+from concurrent.futures import ThreadPoolExecutor
+from google_clients import get_drive_service
+from drive_uploader import upload_file, report_dedup
+from drive_index import get_drive_index
+from sheets_client import add_video_to_sheet, flush_sheet_rows # <-- Import the new function
+from quality_gate import check_clip_quality, trim_args
+from captions import CAPTION_PREFETCH, caption_one, generate_captions, headline_spec, report_caption_cache
+from video_fingerprint import check_duplicate, register_upload
 
 # ------------------ Google Drive Integration ------------------
 SCOPES = ['https://www.googleapis.com/auth/drive']
-SERVICE_ACCOUNT_INFO = json.loads(os.environ['GDRIVE_SERVICE_ACCOUNT'])
-
 def authenticate_drive():
-    creds = service_account.Credentials.from_service_account_info(
-        SERVICE_ACCOUNT_INFO, scopes=SCOPES
-    )
-    return build('drive', 'v3', credentials=creds)
+    return get_drive_service(SCOPES)
 
 def get_or_create_folder(drive_service, folder_name):
-    q = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-    res = drive_service.files().list(q=q, fields="files(id)").execute()
-    items = res.get('files', [])
-    if items:
-        return items[0]['id']
-    folder = drive_service.files().create(
-        body={'name': folder_name, 'mimeType': 'application/vnd.google-apps.folder'},
-        fields='id'
-    ).execute()
-    return folder['id']
+    return get_drive_index(drive_service).get_or_create_folder(folder_name)
 
 def upload_to_drive(drive_service, folder_id, file_path):
     name = os.path.basename(file_path)
-    media = MediaFileUpload(file_path)
-    drive_service.files().create(
-        body={'name': name, 'parents': [folder_id]},
-        media_body=media
-    ).execute()
+    upload_file(drive_service, file_path, folder_id)
     print(f"Uploaded {name} to Google Drive")
 
 
@@ -102,11 +86,11 @@ def download_video(url):
         print(f"❌ Download failed for {url}: {e}")
         return None, 0
 
-def convert_to_tiktok(video_path):
+def convert_to_tiktok(video_path, trim=None):
     w, h = get_video_resolution(video_path)
     if not w or not h or abs(w/h - 9/16) < 0.02:
         cmd = [
-            'ffmpeg','-i',video_path,
+            'ffmpeg',*trim_args(trim),'-i',video_path,
             '-vf','scale=1080:1920:force_original_aspect_ratio=increase,'
                  'crop=1080:1920,setsar=1',
             '-c:v','libx264','-preset','fast','-crf','23',
@@ -125,7 +109,7 @@ def convert_to_tiktok(video_path):
             f"[bg][fg]overlay=(W-w)/2:(H-h)/2:format=auto,setsar=1"
         )
         cmd = [
-            'ffmpeg','-i',video_path,
+            'ffmpeg',*trim_args(trim),'-i',video_path,
             '-vf', filt,
             '-c:v','libx264','-preset','fast','-crf','23',
             '-c:a','aac','-y', video_path.replace(".mp4","_VERTICAL.mp4")
@@ -139,53 +123,14 @@ def convert_to_tiktok(video_path):
 
 
 # ------------------ Headline Generation ------------------
+HEADLINE_SPEC = headline_spec("NFL", fallback=lambda post_title: sanitize_filename(post_title)[:100])
+
 def generate_headline(post_title):
-    try:
-        truncated_title = post_title[:200]
-        prompt = (
-            "Rewrite the following Reddit NFL highlight as a short, catchy, viral TikTok caption.\n"
-            "Rules:\n"
-            "- Use at most 2 relevant emojis.\n"
-            "- No hashtags anywhere.\n"
-            "- Keep the caption under 200 characters.\n"
-            "- Make the caption short, natural, and exciting—summarize the moment.\n"
-            "- Output ONLY the TikTok caption, and nothing else (no intro, formatting, or explanation).\n\n"
-            f"Reddit title:\n{truncated_title}\n\n"
-            "TikTok caption:"
-        )
-        headers = {
-            "Authorization": f"Bearer {os.environ['OPENROUTER_API_KEY']}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": "meta-llama/llama-3.3-70b-instruct:free",
-            "messages": [{
-                "role": "system",
-                "content": (
-                    "You are a social media expert specializing in creating viral, concise TikTok captions from NFL highlight titles. "
-                    "Always obey all instructions precisely and never go over 200 characters."
-                )
-            }, {
-                "role": "user",
-                "content": prompt
-            }],
-            "max_tokens": 500,  # Allow slightly longer for safety
-            "temperature": 0.85
-        }
-        response = requests.post("https://openrouter.ai/api/v1/chat/completions", json=payload, headers=headers)
-        response.raise_for_status()
-        content = response.json()['choices'][0]['message']['content'].strip()
-        # Only take first line and trim
-        caption = content.split('\n').replace('_VERTICAL.mp4', '')
-        caption = re.sub(r'#\w+', '', caption)
-        caption = caption.strip()
-        if len(caption) > 200:
-            caption = caption[:197] + "..."
-        return caption
-    except Exception as e:
-        print(f"⚠️ Headline generation failed: {str(e)}")
-        return sanitize_filename(post_title)[:100]
+    return caption_one(post_title, HEADLINE_SPEC)
 
+def generate_headlines(post_titles):
+    """Caption a whole run's titles in about one round trip"""
+    return generate_captions(post_titles, HEADLINE_SPEC)
 
 # ------------------ Main ------------------
 reddit = praw.Reddit(
@@ -204,61 +149,90 @@ if __name__ == "__main__":
     print(f"Searching for {target} videos in /r/NFL, checking up to 150 posts.")
 
     # Increased limit from 50 to 150 for more resilience
-    for i, post in enumerate(reddit.subreddit("NFL").top(time_filter="day", limit=150)):
-        if processed >= target:
-            print(f"Target of {target} videos reached. Exiting.")
-            break
+    posts = list(reddit.subreddit("NFL").top(time_filter="day", limit=150))
+
+    # Caption the first candidates in the background while videos download;
+    # anything past the prefetch window is captioned on demand
+    candidates = [post.title for post in posts if any(d in post.url for d in VIDEO_DOMAINS)]
+    caption_pool = ThreadPoolExecutor(max_workers=1)
+    headlines_future = caption_pool.submit(generate_headlines, candidates[:CAPTION_PREFETCH])
+
+    try:
+        for i, post in enumerate(posts):
+            if processed >= target:
+                print(f"Target of {target} videos reached. Exiting.")
+                break
             
-        print(f"\\n--- Checking post {i+1}: '{post.title}' ---")
+            print(f"\\n--- Checking post {i+1}: '{post.title}' ---")
         
-        # Detailed check for video domain
-        if not any(d in post.url for d in VIDEO_DOMAINS):
-            print(f"-> Skipping: URL '{post.url}' is not a recognized video domain.")
-            continue
-
-        # Detailed check for download and duration
-        path, dur = download_video(post.url)
-        if not path:
-            print(f"-> Skipping: Video download failed for URL: {post.url}")
-            continue
+            # Detailed check for video domain
+            if not any(d in post.url for d in VIDEO_DOMAINS):
+                print(f"-> Skipping: URL '{post.url}' is not a recognized video domain.")
+                continue
+
+            # Detailed check for download and duration
+            path, dur = download_video(post.url)
+            if not path:
+                print(f"-> Skipping: Video download failed for URL: {post.url}")
+                continue
             
-        if not (10 <= dur <= 180):
-            print(f"-> Skipping: Video duration ({dur}s) is outside the 10-180s range.")
-            if os.path.exists(path):  # Clean up downloaded file
+            if not (10 <= dur <= 180):
+                print(f"-> Skipping: Video duration ({dur}s) is outside the 10-180s range.")
+                if os.path.exists(path):  # Clean up downloaded file
+                    os.remove(path)
+                continue
+
+            print(f"  \\_ Video downloaded successfully (Duration: {dur}s). Path: {path}")
+
+            quality = check_clip_quality(path, profile='nfl')
+            if not quality['passed']:
+                print(f"-> Skipping: Quality gate rejected the clip ({quality['reason']}).")
                 os.remove(path)
-            continue
+                continue
+            if quality['trim']:
+                print(f"  \\_ Trimming dead air: keeping {quality['trim'][0]:.2f}-{quality['trim'][1]:.2f}s")
 
-        print(f"  \\_ Video downloaded successfully (Duration: {dur}s). Path: {path}")
+            fingerprint, duplicate = check_duplicate(path)
+            if duplicate:
+                print(f"-> Skipping: Clip was already uploaded as '{duplicate['name']}'.")
+                os.remove(path)
+                continue
 
-        vert = convert_to_tiktok(path)
-        os.remove(path)  # Clean up original file after conversion attempt
-        if not vert:
-            print(f"-> Skipping: Video conversion to vertical format failed.")
-            continue
+            vert = convert_to_tiktok(path, trim=quality['trim'])
+            os.remove(path)  # Clean up original file after conversion attempt
+            if not vert:
+                print(f"-> Skipping: Video conversion to vertical format failed.")
+                continue
 
-        print(f"  \\_ Video converted successfully. Path: {vert}")
+            print(f"  \\_ Video converted successfully. Path: {vert}")
 
-        headline = sanitize_filename(generate_headline(post.title))
-        final = f"{headline}.mp4"
-        os.rename(vert, final)
+            headline = sanitize_filename(headlines_future.result().get(post.title) or generate_headline(post.title))
+            final = f"{headline}.mp4"
+            os.rename(vert, final)
         
-        print(f"  \\_ Headline generated: '{headline}'")
+            print(f"  \\_ Headline generated: '{headline}'")
 
-        upload_to_drive(drive, folder_id, final)
+            upload_to_drive(drive, folder_id, final)
+            register_upload(fingerprint, "NFL", headline)
         
-        # --- Add data to Google Sheet ---
-        try:
-            add_video_to_sheet(
-                source="NFL",
-                reddit_url=post.url,
-                reddit_caption=post.title,
-                drive_video_name=headline
-            )
-        except Exception as e:
-            print(f"⚠️ Failed to add data to Google Sheet: {e}")
+            # --- Add data to Google Sheet ---
+            try:
+                add_video_to_sheet(
+                    source="NFL",
+                    reddit_url=post.url,
+                    reddit_caption=post.title,
+                    drive_video_name=headline
+                )
+            except Exception as e:
+                print(f"⚠️ Failed to add data to Google Sheet: {e}")
 
-        os.remove(final)
-        processed += 1
-        print(f"✅ Processed and uploaded: {headline}")
+            os.remove(final)
+            processed += 1
+            print(f"✅ Processed and uploaded: {headline}")
         
-    print(f"\\nFinished processing. Total videos uploaded: {processed}.")
+        print(f"\\nFinished processing. Total videos uploaded: {processed}.")
+    finally:
+        caption_pool.shutdown()
+        flush_sheet_rows()
+    report_caption_cache()
+    report_dedup()
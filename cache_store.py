@@ -0,0 +1,99 @@
+import os
+import json
+import time
+import threading
+
+# ------------------ Persistent JSON Cache ------------------
+# Everything the bots remember between runs lives under CACHE_DIR. The
+# GitHub workflows restore/save this directory with actions/cache.
+CACHE_DIR = os.environ.get('SCRAPER_CACHE_DIR', '.cache')
+
+def cache_path(name):
+    """Return a path inside CACHE_DIR, creating the directory if needed"""
+    path = os.path.join(CACHE_DIR, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+class JsonCache:
+    """
+    Small key/value cache persisted as a single JSON file.
+
+    Entries expire after `ttl` seconds (None = never) and the oldest are
+    evicted once more than `max_entries` are stored. Hits and misses are
+    counted so callers can report hit rates.
+    """
+
+    def __init__(self, name, ttl=None, max_entries=None):
+        self.path = cache_path(name)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _expired(self, entry):
+        return self.ttl is not None and time.time() - entry['t'] > self.ttl
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or self._expired(entry):
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry['v']
+
+    def get_first(self, keys, default=None):
+        """Value of the first live key in `keys`; counts as a single hit or miss"""
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is not None and not self._expired(entry):
+                    self.hits += 1
+                    return entry['v']
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = {'t': time.time(), 'v': value}
+            if self.max_entries and len(self._data) > self.max_entries:
+                oldest = sorted(self._data, key=lambda k: self._data[k]['t'])
+                for k in oldest[:len(self._data) - self.max_entries]:
+                    del self._data[k]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def values(self):
+        with self._lock:
+            return [e['v'] for e in self._data.values() if not self._expired(e)]
+
+    def items(self):
+        with self._lock:
+            return [(k, e['v']) for k, e in self._data.items() if not self._expired(e)]
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def save(self):
+        """Write the cache atomically, dropping expired entries"""
+        with self._lock:
+            data = {k: e for k, e in self._data.items() if not self._expired(e)}
+            tmp = f"{self.path}.tmp"
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"⚠️ Could not save cache {self.path}: {e}")
@@ -0,0 +1,229 @@
+import re
+import json
+import hashlib
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from cache_store import JsonCache
+from llm_client import chat_completion, report_llm_stats, stop_at_any, stop_at_chars, stop_at_first_line, stop_at_json
+
+# ------------------ Caption Cache ------------------
+# Reruns and retries keep asking OpenRouter to caption the same Reddit title
+# or movie scene. Post-processed captions are cached by a hash of
+# (normalized title, prompt template version, model), so bumping the template
+# version or switching models naturally invalidates old entries. Answers are
+# stored under the model that actually wrote them (a fallback or hedged
+# model); lookups try the spec's models in preference order, so a hedged or
+# fallback answer is reused on the next run but a primary-model caption wins
+# whenever there is one.
+CAPTION_TTL = 30 * 24 * 3600
+CAPTION_CACHE_SIZE = 5000
+
+caption_cache = JsonCache('captions.json', ttl=CAPTION_TTL, max_entries=CAPTION_CACHE_SIZE)
+
+def normalize_title(title):
+    """Case/whitespace/unicode-insensitive form of a title for cache keys"""
+    title = unicodedata.normalize('NFKC', title or '').lower()
+    return re.sub(r'\s+', ' ', title).strip()
+
+def caption_key(title, template_version, model):
+    raw = json.dumps([normalize_title(title), template_version, model], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def item_text(item, spec):
+    return spec['text'](item) if spec.get('text') else item
+
+def cached_caption(item, spec):
+    """Cached caption from the spec's primary model or, failing that, its fallbacks"""
+    models = [spec['model'], *spec.get('fallbacks', ())]
+    return caption_cache.get_first([caption_key(item_text(item, spec), spec['version'], m) for m in models])
+
+def report_caption_cache():
+    total = caption_cache.hits + caption_cache.misses
+    print(f"🗂️ Caption cache: {caption_cache.hits}/{total} hits ({caption_cache.hit_rate():.0%})")
+    report_llm_stats()
+
+# ------------------ Batched Caption Service ------------------
+# A caption spec is a dict describing one kind of caption:
+#   model, version        - cache key parts (see caption_key)
+#   fallbacks             - optional models to try if `model` fails
+#   hedge                 - race the first fallback against a slow `model`
+#   system                - optional system message
+#   instructions          - the rules, without the item itself
+#   prompt(item)          - full single-item prompt
+#   postprocess(text)     - clean one raw caption ('' = unusable)
+#   text(item)            - optional string form of a non-string item (e.g. a
+#                           tuple of fields), used for cache keys and batch
+#                           prompts; defaults to the item itself
+#   fallback(item)        - caption to use when the LLM fails (not cached)
+#   stop                  - optional llm_client stop condition; the reply is
+#                           streamed and cut off as soon as it is met
+#   max_tokens, temperature
+# generate_captions() serves cached items first, sends the rest as a few
+# structured batch requests (JSON array out) in parallel and fans out single
+# requests only for items the batch answer didn't cover.
+BATCH_SIZE = 20
+MAX_CONCURRENCY = 4
+BATCH_TOKENS_PER_ITEM = 80
+MAX_ITEM_CHARS = 200           # same cap as the single-item prompts
+
+def generate_captions(items, spec):
+    """Return {item: caption} for every item; never raises"""
+    results = {}
+    pending = []
+    for item in dict.fromkeys(items):
+        cached = cached_caption(item, spec)
+        if cached is not None:
+            results[item] = cached
+        else:
+            pending.append(item)
+    if not pending:
+        return results
+
+    chunks = [pending[i:i + BATCH_SIZE] for i in range(0, len(pending), BATCH_SIZE)]
+    print(f"📝 Captioning {len(pending)} items in {len(chunks)} batch request(s) "
+          f"({len(results)} from cache)")
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as pool:
+        for captions in pool.map(lambda chunk: _caption_chunk(chunk, spec), chunks):
+            results.update(captions)
+
+        missing = [item for item in pending if item not in results]
+        if missing:
+            print(f"📝 Batch answer missed {len(missing)} items, captioning them individually")
+            for item, caption in zip(missing, pool.map(lambda item: caption_one(item, spec, save=False, lookup=False), missing)):
+                results[item] = caption
+    caption_cache.save()
+    return results
+
+def caption_one(item, spec, save=True, lookup=True):
+    """
+    Caption a single item (cache first), falling back to spec['fallback'].
+    lookup=False skips the cache check for items the caller already missed,
+    so each item is counted once in the hit rate.
+    """
+    if lookup:
+        cached = cached_caption(item, spec)
+        if cached is not None:
+            print(f"🗂️ Caption cache hit: {cached[:60]}")
+            return cached
+    try:
+        messages = [{"role": "user", "content": spec['prompt'](item)}]
+        if spec.get('system'):
+            messages.insert(0, {"role": "system", "content": spec['system']})
+        content, model = chat_completion(
+            spec['model'], messages,
+            max_tokens=spec.get('max_tokens', 500),
+            temperature=spec.get('temperature', 0.7),
+            stop=spec.get('stop'),
+            fallbacks=spec.get('fallbacks', ()),
+            hedge=spec.get('hedge', False),
+            with_model=True
+        )
+        caption = spec['postprocess'](content)
+        if not caption:
+            raise ValueError("empty caption")
+        caption_cache.set(caption_key(item_text(item, spec), spec['version'], model), caption)
+        if save:
+            caption_cache.save()
+        return caption
+    except Exception as e:
+        print(f"⚠️ Caption generation failed: {e}")
+        return spec['fallback'](item)
+
+def _caption_chunk(chunk, spec):
+    """One structured request for a whole chunk; returns only validated captions"""
+    numbered = "\n".join(f"{i + 1}. {item_text(item, spec)[:MAX_ITEM_CHARS]}" for i, item in enumerate(chunk))
+    prompt = (
+        f"Apply the instructions below to each of the {len(chunk)} numbered inputs independently.\n"
+        f"Return ONLY a JSON array of exactly {len(chunk)} strings, in the same order, "
+        "one result per input, with no other text.\n\n"
+        f"Instructions:\n{spec['instructions']}\n\n"
+        f"Inputs:\n{numbered}"
+    )
+    messages = [{"role": "user", "content": prompt}]
+    if spec.get('system'):
+        messages.insert(0, {"role": "system", "content": spec['system']})
+    try:
+        content, model = chat_completion(
+            spec['model'], messages,
+            max_tokens=BATCH_TOKENS_PER_ITEM * len(chunk) + 50,
+            temperature=spec.get('temperature', 0.7),
+            stop=stop_at_json(),
+            fallbacks=spec.get('fallbacks', ()),
+            with_model=True
+        )
+        captions = _parse_json_array(content)
+    except Exception as e:
+        print(f"⚠️ Batch caption request failed: {e}")
+        return {}
+    if len(captions) != len(chunk):
+        print(f"⚠️ Batch returned {len(captions)} captions for {len(chunk)} inputs, ignoring it")
+        return {}
+
+    results = {}
+    for item, raw in zip(chunk, captions):
+        caption = spec['postprocess'](raw) if isinstance(raw, str) else ''
+        if caption:
+            caption_cache.set(caption_key(item_text(item, spec), spec['version'], model), caption)
+            results[item] = caption
+    return results
+
+def _parse_json_array(content):
+    start, end = content.find('['), content.rfind(']')
+    if start == -1 or end <= start:
+        raise ValueError("no JSON array in response")
+    data = json.loads(content[start:end + 1])
+    if not isinstance(data, list):
+        raise ValueError("response is not a JSON array")
+    return data
+
+# ------------------ Reddit Headline Spec ------------------
+# The NBA and NFL bots turn Reddit highlight titles into TikTok captions with
+# the same prompt, only the league name differs. Each league keeps its own
+# prompt version so their cache entries never mix.
+HEADLINE_MODEL = "meta-llama/llama-3.3-70b-instruct:free"
+HEADLINE_FALLBACK_MODELS = ["google/gemini-2.0-flash-lite-001", "mistralai/mistral-7b-instruct"]
+HEADLINE_MAX_CHARS = 400
+HEADLINE_PROMPT_VERSION = "caption-v1"  # bump when the prompt or post-processing changes
+CAPTION_PREFETCH = 15  # candidate titles captioned up front in one batch
+
+def _headline_rules(league):
+    return (
+        f"Rewrite the following Reddit {league} highlight as a short, catchy, viral TikTok caption.\n"
+        "Rules:\n"
+        "- Use at most 2 relevant emojis.\n"
+        "- No hashtags anywhere.\n"
+        "- Keep the caption under 200 characters.\n"
+        "- Make the caption short, natural, and exciting—summarize the moment.\n"
+        "- Output ONLY the TikTok caption, and nothing else (no intro, formatting, or explanation)."
+    )
+
+def _clean_headline(content):
+    # Only take first line and trim
+    caption = content.strip().split('\n')[0].replace('_VERTICAL.mp4', '')
+    caption = re.sub(r'#\w+', '', caption)
+    caption = caption.strip()
+    if len(caption) > 200:
+        caption = caption[:197] + "..."
+    return caption
+
+def headline_spec(league, fallback):
+    """Caption spec for `league` Reddit titles; `fallback(title)` is used when the LLM fails"""
+    rules = _headline_rules(league)
+    return {
+        'model': HEADLINE_MODEL,
+        'version': f"{league.lower()}-{HEADLINE_PROMPT_VERSION}",
+        'fallbacks': HEADLINE_FALLBACK_MODELS,
+        'hedge': True,  # the free tier is often slow; race a paid model past its p50
+        'system': (
+            f"You are a social media expert specializing in creating viral, concise TikTok captions from {league} highlight titles. "
+            "Always obey all instructions precisely and never go over 200 characters."
+        ),
+        'instructions': rules,
+        'prompt': lambda post_title: f"{rules}\n\nReddit title:\n{post_title[:200]}\n\nTikTok caption:",
+        'postprocess': _clean_headline,
+        'fallback': fallback,
+        # Only the first line is ever used, so stop streaming once it arrives
+        'stop': stop_at_any(stop_at_first_line(), stop_at_chars(HEADLINE_MAX_CHARS)),
+        'max_tokens': 500,
+        'temperature': 0.85
+    }
@@ -1,21 +1,39 @@
-import os
-import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-
-# Load service account credentials from environment variable
-service_account_info = json.loads(os.environ["GDRIVE_SERVICE_ACCOUNT"])
-creds = service_account.Credentials.from_service_account_info(
-    service_account_info,
-    scopes=["https://www.googleapis.com/auth/drive"]
-)
-drive_service = build("drive", "v3", credentials=creds)
-
-def list_all_file_ids():
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from googleapiclient.errors import HttpError
+from google_clients import get_drive_service
+
+# Deletes are sent as Drive batch requests (up to 100 calls each), several
+# batches at a time. A service object (and its HTTP transport) is not
+# thread-safe, so get_drive_service() hands every worker thread its own.
+BATCH_SIZE = 100
+BATCH_WORKERS = 4
+MAX_ROUNDS = 5                 # retry rounds for failed sub-requests
+DEFAULT_MAX_AGE_DAYS = 3
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+def build_query(folders=(), mime_types=(), older_than_days=None, include_folders=False):
+    """Server-side scope: only files the service account owns, optionally narrowed further"""
+    clauses = ["'me' in owners", "trashed=false"]
+    if folders:
+        clauses.append("(" + " or ".join(f"'{f}' in parents" for f in folders) + ")")
+    if mime_types:
+        clauses.append("(" + " or ".join(f"mimeType='{m}'" for m in mime_types) + ")")
+    elif not include_folders:
+        clauses.append("mimeType!='application/vnd.google-apps.folder'")
+    if older_than_days is not None:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+        clauses.append(f"modifiedTime < '{cutoff.strftime('%Y-%m-%dT%H:%M:%S')}'")
+    return " and ".join(clauses)
+
+def list_file_ids(query):
     file_ids = []
     page_token = None
     while True:
-        response = drive_service.files().list(
+        response = get_drive_service().files().list(
+            q=query,
             fields="nextPageToken, files(id, name)",
             pageSize=1000,
             pageToken=page_token
@@ -27,24 +45,87 @@ def list_all_file_ids():
             break
     return file_ids
 
-def delete_files(file_ids):
+def _delete_batch(file_ids):
+    """Delete one batch; returns (deleted_count, retryable_ids, failed_count)"""
+    deleted, retry, failed = [0], [], [0]
+
+    def callback(request_id, response, exception):
+        if exception is None:
+            deleted[0] += 1
+            return
+        status = exception.resp.status if isinstance(exception, HttpError) else None
+        # Drive reports rate limits as 403 rateLimitExceeded / userRateLimitExceeded
+        if status == 403 and b"ateLimitExceeded" in (exception.content or b""):
+            status = 429
+        if status == 404:
+            deleted[0] += 1  # already gone
+        elif status in RETRYABLE_STATUS or status is None:
+            retry.append(request_id)
+        else:
+            failed[0] += 1
+            print(f"Failed to delete {request_id}: {exception}")
+
+    service = get_drive_service()
+    batch = service.new_batch_http_request(callback=callback)
     for file_id in file_ids:
-        try:
-            drive_service.files().delete(fileId=file_id).execute()
-            print(f"Deleted file: {file_id}")
-        except Exception as e:
-            print(f"Failed to delete {file_id}: {e}")
+        batch.add(service.files().delete(fileId=file_id), request_id=file_id)
+    try:
+        batch.execute()
+    except Exception as e:
+        # The whole batch request failed; retry every call in it
+        print(f"Batch of {len(file_ids)} failed: {e}")
+        return 0, list(file_ids), 0
+    return deleted[0], retry, failed[0]
+
+def delete_files(file_ids, dry_run=False):
+    if dry_run:
+        print(f"Dry run: would delete {len(file_ids)} files.")
+        return
+    start = time.time()
+    deleted = failed = 0
+    pending = list(file_ids)
+    for round_no in range(1, MAX_ROUNDS + 1):
+        if not pending:
+            break
+        if round_no > 1:
+            delay = min(60, 2 ** round_no)
+            print(f"Retrying {len(pending)} deletes in {delay}s (round {round_no}/{MAX_ROUNDS})")
+            time.sleep(delay)
+        batches = [pending[i:i + BATCH_SIZE] for i in range(0, len(pending), BATCH_SIZE)]
+        pending = []
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+            for ok, retry, bad in pool.map(_delete_batch, batches):
+                deleted += ok
+                failed += bad
+                pending.extend(retry)
+    failed += len(pending)
+    elapsed = max(time.time() - start, 0.001)
+    print(f"Deleted {deleted} files, {failed} failed, in {elapsed:.1f}s ({deleted / elapsed:.1f} files/s).")
 
 def empty_trash():
     try:
-        drive_service.files().emptyTrash().execute()
+        get_drive_service().files().emptyTrash().execute()
         print("Trash emptied.")
     except Exception as e:
         print(f"Failed to empty trash: {e}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Delete old files owned by the service account.")
+    parser.add_argument("--folder", action="append", default=[], help="Only files in this folder id (repeatable)")
+    parser.add_argument("--mime", action="append", default=[], help="Only this mimeType (repeatable)")
+    parser.add_argument("--older-than-days", type=float, default=DEFAULT_MAX_AGE_DAYS,
+                        help="Only files last modified more than this many days ago")
+    parser.add_argument("--include-folders", action="store_true", help="Also delete folders")
+    parser.add_argument("--dry-run", action="store_true", help="List what would be deleted")
+    parser.add_argument("--keep-trash", action="store_true", help="Don't empty the trash afterwards")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    print("Listing all files...")
-    files = list_all_file_ids()
+    args = parse_args()
+    query = build_query(args.folder, args.mime, args.older_than_days, args.include_folders)
+    print(f"Listing files matching: {query}")
+    files = list_file_ids(query)
     print(f"Found {len(files)} files.")
-    delete_files(files)
-    empty_trash()
\ No newline at end of file
+    delete_files(files, dry_run=args.dry_run)
+    if not args.dry_run and not args.keep_trash:
+        empty_trash()
@@ -1,47 +1,28 @@
 import os
 import re
 import subprocess
-import json
 import random
 import praw
 import yt_dlp
-import cv2
-import numpy as np
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from google_clients import get_drive_service
+from drive_uploader import upload_file, report_dedup
+from drive_index import get_drive_index
+from watermark_detection import detect_tiktok_watermark
+from prescreen import screen_post
+from quality_gate import check_clip_quality, trim_args
+from video_fingerprint import check_duplicate, register_upload
 
 # ------------------ Google Drive Integration ------------------
 SCOPES = ['https://www.googleapis.com/auth/drive']
-SERVICE_ACCOUNT_INFO = json.loads(os.environ['GDRIVE_SERVICE_ACCOUNT'])
-
 def authenticate_drive():
-    credentials = service_account.Credentials.from_service_account_info(
-        SERVICE_ACCOUNT_INFO, scopes=SCOPES
-    )
-    return build('drive', 'v3', credentials=credentials)
+    return get_drive_service(SCOPES)
 
 def get_or_create_folder(drive_service, folder_name):
-    query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-    results = drive_service.files().list(q=query, fields="files(id)").execute()
-    items = results.get('files', [])
-    
-    if items:
-        return items[0]['id']
-    else:
-        folder = drive_service.files().create(
-            body={'name': folder_name, 'mimeType': 'application/vnd.google-apps.folder'},
-            fields='id'
-        ).execute()
-        return folder['id']
+    return get_drive_index(drive_service).get_or_create_folder(folder_name)
 
 def upload_to_drive(drive_service, folder_id, file_path):
     file_name = os.path.basename(file_path)
-    media = MediaFileUpload(file_path)
-    drive_service.files().create(
-        body={'name': file_name, 'parents': [folder_id]},
-        media_body=media
-    ).execute()
+    upload_file(drive_service, file_path, folder_id)
     print(f"Uploaded {file_name} to Google Drive")
 
 # ------------------ Video Processing ------------------
@@ -127,155 +108,7 @@ def download_video(url):
         print(f"❌ Download failed for {url}: {str(e)}")
         return None, 0
 
-def detect_tiktok_watermark(video_path):
-    """
-    Detect TikTok watermarks in video frames.
-    Returns True if TikTok watermark is detected, False otherwise.
-    """
-    try:
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            print("⚠️ Could not open video for watermark detection")
-            return False
-        
-        # Get video properties
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        duration = total_frames / fps if fps > 0 else 0
-        
-        # Sample frames for detection (check every 2 seconds)
-        sample_interval = max(1, int(fps * 2))
-        frames_to_check = min(5, total_frames // sample_interval)  # Check up to 5 frames
-        
-        watermark_detected = False
-        frames_checked = 0
-        
-        print(f"🔍 Checking {frames_to_check} frames for TikTok watermark...")
-        
-        for i in range(0, total_frames, sample_interval):
-            if frames_checked >= frames_to_check:
-                break
-                
-            cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-            ret, frame = cap.read()
-            
-            if not ret:
-                continue
-                
-            frames_checked += 1
-            
-            # Check for TikTok watermark in this frame
-            if _check_frame_for_tiktok_watermark(frame):
-                watermark_detected = True
-                print(f"🚫 TikTok watermark detected in frame {i}")
-                break
-        
-        cap.release()
-        
-        if watermark_detected:
-            print("❌ Skipping: TikTok watermark detected")
-        else:
-            print("✅ No TikTok watermark detected")
-            
-        return watermark_detected
-        
-    except Exception as e:
-        print(f"⚠️ Error during watermark detection: {e}")
-        return False
-
-def _check_frame_for_tiktok_watermark(frame):
-    """
-    Check a single frame for TikTok watermark patterns.
-    Returns True if watermark is detected, False otherwise.
-    """
-    try:
-        height, width = frame.shape[:2]
-        
-        # Focus on bottom-left region where TikTok watermarks typically appear
-        # Check bottom 25% and left 40% of the frame
-        roi_height = int(height * 0.25)
-        roi_width = int(width * 0.4)
-        roi = frame[height - roi_height:height, 0:roi_width]
-        
-        if roi.size == 0:
-            return False
-        
-        # Convert to different color spaces for better detection
-        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-        hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-        
-        # Method 1: Look for TikTok logo-like patterns (musical note icon)
-        # TikTok logo typically has high contrast and specific shape
-        _, binary = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY)
-        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # Look for small, compact contours that could be the TikTok logo
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if 50 < area < 2000:  # Reasonable size for TikTok logo
-                x, y, w, h = cv2.boundingRect(contour)
-                aspect_ratio = w / h if h > 0 else 0
-                if 0.5 < aspect_ratio < 2.0:  # TikTok logo is roughly square-ish
-                    # Check if it's in the expected position (near bottom-left)
-                    if y > roi_height * 0.3:  # In bottom portion
-                        return True
-        
-        # Method 2: Look for TikTok text patterns
-        # TikTok watermarks often have white text on semi-transparent background
-        # Look for regions with high brightness and specific text patterns
-        
-        # Create mask for bright regions (potential text)
-        _, bright_mask = cv2.threshold(gray, 180, 255, cv2.THRESH_BINARY)
-        
-        # Look for horizontal lines of text (TikTok username format)
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (20, 1))
-        horizontal_lines = cv2.morphologyEx(bright_mask, cv2.MORPH_OPEN, kernel)
-        
-        # Count horizontal text-like regions
-        contours, _ = cv2.findContours(horizontal_lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        text_like_regions = 0
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if 100 < area < 5000:  # Reasonable size for text
-                x, y, w, h = cv2.boundingRect(contour)
-                aspect_ratio = w / h if h > 0 else 0
-                if aspect_ratio > 3:  # Text is typically wide
-                    text_like_regions += 1
-        
-        # If we find multiple text-like regions, it might be a TikTok watermark
-        if text_like_regions >= 2:
-            return True
-        
-        # Method 3: Look for characteristic TikTok watermark colors
-        # TikTok watermarks often have specific color patterns
-        
-        # Look for white/light regions with semi-transparency
-        white_mask = cv2.inRange(hsv, np.array([0, 0, 200]), np.array([180, 30, 255]))
-        
-        # Check if there are significant white regions in the expected area
-        white_pixels = cv2.countNonZero(white_mask)
-        total_pixels = roi.shape[0] * roi.shape[1]
-        white_ratio = white_pixels / total_pixels if total_pixels > 0 else 0
-        
-        # If more than 15% of the ROI is white, it might be a watermark
-        if white_ratio > 0.15:
-            # Additional check: look for gradient patterns typical of TikTok watermarks
-            # TikTok watermarks often have a gradient from transparent to opaque
-            edges = cv2.Canny(gray, 50, 150)
-            edge_density = cv2.countNonZero(edges) / total_pixels if total_pixels > 0 else 0
-            
-            # High edge density in bright regions suggests text/logo
-            if edge_density > 0.05:
-                return True
-        
-        return False
-        
-    except Exception as e:
-        print(f"⚠️ Error in frame watermark detection: {e}")
-        return False
-
-def convert_to_tiktok(video_path):
+def convert_to_tiktok(video_path, trim=None):
     """Convert to 1080x1920 with a subtle crop offset and minor pitch shift."""
     try:
         output_path = video_path.replace(".mp4", "_VERTICAL.mp4")
@@ -310,7 +143,7 @@ def convert_to_tiktok(video_path):
 
         # Add error handling and verbose output for debugging
         cmd = [
-            'ffmpeg', '-y', '-i', video_path,
+            'ffmpeg', '-y', *trim_args(trim), '-i', video_path,
             '-vf', vf,
             '-c:v', 'libx264', '-preset', 'fast', '-crf', '23',
             '-af', af,
@@ -331,7 +164,7 @@ def convert_to_tiktok(video_path):
             vf_fallback = "scale=1080:1920:force_original_aspect_ratio=increase,setsar=1"
             
             cmd_fallback = [
-                'ffmpeg', '-y', '-i', video_path,
+                'ffmpeg', '-y', *trim_args(trim), '-i', video_path,
                 '-vf', vf_fallback,
                 '-c:v', 'libx264', '-preset', 'fast', '-crf', '23',
                 '-af', af,
@@ -366,13 +199,16 @@ if __name__ == "__main__":
     
     # Configuration options
     ENABLE_WATERMARK_DETECTION = True  # Set to False to disable TikTok watermark detection
+    WATERMARK_METHOD = "temporal"      # "temporal" (static overlay anywhere) or "roi" (bottom-left heuristics)
+    ENABLE_PRESCREEN = True            # Screen previews / low-res renditions before the full download
+    seen_hashes = []                   # Preview hashes of candidates uploaded this run
     
     drive_service = authenticate_drive()
     folder_id = get_or_create_folder(drive_service, "Dog Videos")  # Changed folder name
 
     print("\n" + "="*40)
     print(f"🚀 Processing {target} videos from r/dogvideos")
-    print(f"🔍 TikTok watermark detection: {'ENABLED' if ENABLE_WATERMARK_DETECTION else 'DISABLED'}")
+    print(f"🔍 TikTok watermark detection: {'ENABLED (' + WATERMARK_METHOD + ')' if ENABLE_WATERMARK_DETECTION else 'DISABLED'}")
     print("="*40)
 
     for post in reddit.subreddit("dogvideos").top(time_filter="day", limit=50):  # Changed subreddit
@@ -386,6 +222,14 @@ if __name__ == "__main__":
             if not any(domain in post.url for domain in VIDEO_DOMAINS):
                 print(f"⚠️ Skipping: Unsupported URL - {post.url}")
                 continue
+
+            # Cheap checks on preview images / low-res renditions first
+            screening = None
+            if ENABLE_PRESCREEN:
+                screening = screen_post(post, seen_hashes, check_watermark=ENABLE_WATERMARK_DETECTION)
+                if not screening['passed']:
+                    print(f"⚠️ Skipping: {screening['reason']}")
+                    continue
                 
             video_path, duration = download_video(post.url)
             if not video_path:
@@ -401,13 +245,29 @@ if __name__ == "__main__":
                 os.remove(video_path)
                 continue
             
-            # Check for TikTok watermark before processing
-            if ENABLE_WATERMARK_DETECTION and detect_tiktok_watermark(video_path):
+            # Check for TikTok watermark before processing (unless screening
+            # already ran it on a low-res rendition)
+            already_checked = screening is not None and screening.get('watermark_checked')
+            if ENABLE_WATERMARK_DETECTION and not already_checked and detect_tiktok_watermark(video_path, method=WATERMARK_METHOD):
                 print(f"🚫 Skipping: TikTok watermark detected in {post.title[:50]}...")
                 os.remove(video_path)
                 continue
             
-            vertical_path = convert_to_tiktok(video_path)
+            quality = check_clip_quality(video_path, profile='dogs')
+            if not quality['passed']:
+                print(f"⚠️ Skipping: {quality['reason']}")
+                os.remove(video_path)
+                continue
+            if quality['trim']:
+                print(f"✂️ Trimming dead air: keeping {quality['trim'][0]:.2f}-{quality['trim'][1]:.2f}s")
+
+            fingerprint, duplicate = check_duplicate(video_path)
+            if duplicate:
+                print(f"⚠️ Skipping: already uploaded as '{duplicate['name']}'")
+                os.remove(video_path)
+                continue
+
+            vertical_path = convert_to_tiktok(video_path, trim=quality['trim'])
             if video_path and os.path.exists(video_path):
                 os.remove(video_path)  # Clean up original video
             
@@ -417,6 +277,9 @@ if __name__ == "__main__":
                 os.rename(vertical_path, final_path)
                 
                 upload_to_drive(drive_service, folder_id, final_path)
+                register_upload(fingerprint, "Dogs", sanitized_title)
+                if screening is not None and screening.get('hash'):
+                    seen_hashes.append(screening['hash'])
                 os.remove(final_path)
                 processed += 1
                 print(f"✅ Success: {sanitized_title}")
@@ -427,3 +290,4 @@ if __name__ == "__main__":
     print("\n" + "="*40)
     print(f"🎉 Completed: {processed}/{target} videos processed")
     print("="*40)
+    report_dedup()
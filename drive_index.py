@@ -0,0 +1,203 @@
+import sqlite3
+import threading
+from googleapiclient.errors import HttpError
+from cache_store import cache_path
+
+# ------------------ Local Drive Metadata Index ------------------
+# Folder ids, "is this file already uploaded" checks and folder listings used
+# to be one files().list round trip each. The index keeps a SQLite copy of
+# the service account's Drive metadata, brought up to date at start-up from
+# the changes feed (changes.list since the last saved page token), and is
+# updated locally on every create/delete the bots make. Lookups are then
+# local queries.
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+FILE_FIELDS = 'id, name, parents, md5Checksum, size, modifiedTime, mimeType, trashed'
+PAGE_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    parent TEXT,
+    mime_type TEXT,
+    md5 TEXT,
+    size INTEGER,
+    modified_time TEXT
+);
+CREATE INDEX IF NOT EXISTS files_parent_name ON files (parent, name);
+CREATE INDEX IF NOT EXISTS files_name ON files (name);
+CREATE INDEX IF NOT EXISTS files_md5 ON files (md5, parent);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+class DriveIndex:
+    """SQLite index of Drive files, synced through the changes feed"""
+
+    def __init__(self, drive_service, path=None):
+        self.drive = drive_service
+        self.db = sqlite3.connect(path or cache_path('drive_index.sqlite'), check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.sync()
+
+    # ---- syncing ----
+    def _meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def _set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def sync(self):
+        """Full listing on first use, then only the changes since the saved page token"""
+        with self._lock:
+            token = self._meta('page_token')
+            if token is None:
+                self._full_sync()
+            else:
+                try:
+                    self._apply_changes(token)
+                except HttpError as e:
+                    if e.resp.status not in (400, 404, 410):
+                        raise
+                    # The saved page token is invalid or too old; start over
+                    print(f"⚠️ Drive changes token rejected ({e.resp.status}), rebuilding the index")
+                    self._full_sync()
+            self.db.commit()
+
+    def _full_sync(self):
+        # Take the token first so nothing that changes during the listing is missed
+        token = self.drive.changes().getStartPageToken().execute()['startPageToken']
+        self._set_meta('root_id', self.drive.files().get(fileId='root', fields='id').execute()['id'])
+        self.db.execute("DELETE FROM files")
+        count = 0
+        page_token = None
+        while True:
+            response = self.drive.files().list(
+                q="trashed=false",
+                fields=f"nextPageToken, files({FILE_FIELDS})",
+                pageSize=PAGE_SIZE,
+                pageToken=page_token
+            ).execute()
+            for f in response.get('files', []):
+                self._upsert(f)
+                count += 1
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        self._set_meta('page_token', token)
+        print(f"🗃️ Drive index built: {count} items")
+
+    def _apply_changes(self, token):
+        count = 0
+        while token:
+            response = self.drive.changes().list(
+                pageToken=token,
+                fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))",
+                pageSize=PAGE_SIZE,
+                includeRemoved=True
+            ).execute()
+            for change in response.get('changes', []):
+                f = change.get('file')
+                if change.get('removed') or not f or f.get('trashed'):
+                    self.db.execute("DELETE FROM files WHERE id = ?", (change['fileId'],))
+                else:
+                    self._upsert(f)
+                count += 1
+            if response.get('newStartPageToken'):
+                self._set_meta('page_token', response['newStartPageToken'])
+            token = response.get('nextPageToken')
+        print(f"🗃️ Drive index synced: {count} changes")
+
+    def _upsert(self, f):
+        parents = f.get('parents') or [None]
+        self.db.execute(
+            "INSERT OR REPLACE INTO files (id, name, parent, mime_type, md5, size, modified_time) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (f['id'], f.get('name', ''), parents[0], f.get('mimeType'),
+             f.get('md5Checksum'), int(f['size']) if f.get('size') else None, f.get('modifiedTime'))
+        )
+
+    # ---- local updates ----
+    def record(self, f):
+        """Add a file resource returned by a create/upload call"""
+        with self._lock:
+            self._upsert(f)
+            self.db.commit()
+
+    def forget(self, file_id):
+        with self._lock:
+            self.db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            self.db.commit()
+
+    def delete(self, file_id):
+        """Delete a file on Drive and drop it from the index"""
+        self.drive.files().delete(fileId=file_id).execute()
+        self.forget(file_id)
+
+    # ---- lookups ----
+    def _parent_id(self, parent):
+        return self._meta('root_id') if parent == 'root' else parent
+
+    def find(self, name, parent=None, folder=None):
+        """Return the first matching row (as a dict) or None"""
+        sql = "SELECT * FROM files WHERE name = ?"
+        args = [name]
+        if parent is not None:
+            sql += " AND parent = ?"
+            args.append(self._parent_id(parent))
+        if folder is not None:
+            sql += " AND mime_type = ?" if folder else " AND mime_type != ?"
+            args.append(FOLDER_MIME)
+        with self._lock:
+            row = self.db.execute(sql + " LIMIT 1", args).fetchone()
+        return dict(row) if row else None
+
+    def find_checksum(self, md5, parent=None):
+        """A file with this content, preferring one already in `parent`, or None"""
+        with self._lock:
+            row = self.db.execute(
+                "SELECT * FROM files WHERE md5 = ? ORDER BY parent IS NOT ? LIMIT 1",
+                (md5, self._parent_id(parent))
+            ).fetchone()
+        return dict(row) if row else None
+
+    def exists(self, name, parent=None):
+        return self.find(name, parent, folder=False) is not None
+
+    def list_folder(self, parent):
+        with self._lock:
+            rows = self.db.execute("SELECT * FROM files WHERE parent = ? ORDER BY name",
+                                   (self._parent_id(parent),)).fetchall()
+        return [dict(r) for r in rows]
+
+    def get_or_create_folder(self, name, parent=None):
+        """Folder id by name (optionally under `parent`), creating it if missing"""
+        found = self.find(name, parent, folder=True)
+        if found:
+            return found['id']
+        body = {'name': name, 'mimeType': FOLDER_MIME}
+        if parent is not None:
+            body['parents'] = [parent]
+        folder = self.drive.files().create(body=body, fields=FILE_FIELDS).execute()
+        self.record(folder)
+        return folder['id']
+
+_index = None
+
+def get_drive_index(drive_service):
+    """Open (and sync) the shared index once per process"""
+    global _index
+    if _index is None:
+        _index = DriveIndex(drive_service)
+    return _index
+
+def find_checksum(md5, parent=None):
+    """Look up content in the open index (if any); see DriveIndex.find_checksum"""
+    return _index.find_checksum(md5, parent) if _index is not None else None
+
+def record_created(f):
+    """Tell the open index (if any) about a newly created file"""
+    if _index is not None:
+        _index.record(f)
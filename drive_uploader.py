@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import hashlib
+import mimetypes
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from google.auth.transport.requests import AuthorizedSession, Request
+from cache_store import JsonCache
+from drive_index import find_checksum, record_created
+
+# ------------------ Resumable Drive Uploads ------------------
+# Files are sent through Drive resumable upload sessions in chunks. The chunk
+# size adapts so each chunk takes roughly TARGET_CHUNK_SECONDS at the measured
+# throughput. Errors resume from the last offset Drive acknowledged instead of
+# byte zero, and the session URI is persisted so a crashed run can finish an
+# upload on restart (Drive keeps sessions for about a week).
+UPLOAD_URL = ("https://www.googleapis.com/upload/drive/v3/files?uploadType=resumable"
+              "&fields=id,name,parents,md5Checksum,size,modifiedTime,mimeType")
+CHUNK_UNIT = 256 * 1024              # Drive requires multiples of 256KB
+INITIAL_CHUNK = 8 * 1024 * 1024
+MIN_CHUNK = 1024 * 1024
+MAX_CHUNK = 64 * 1024 * 1024
+TARGET_CHUNK_SECONDS = 4
+MAX_RETRIES = 8
+SESSION_TTL = 6 * 24 * 3600
+
+sessions = JsonCache('drive_upload_sessions.json', ttl=SESSION_TTL)
+
+class UploadError(Exception):
+    pass
+
+# ------------------ Content Dedup ------------------
+# Before anything is sent, the file's MD5 is looked up in the Drive index
+# (Drive keeps md5Checksum for every file). Identical content already in the
+# target folder is not uploaded again; identical content elsewhere is copied
+# server-side with files.copy. The hash is taken in one read right after
+# the encoder finished (the file is still in the page cache), memoized per
+# file version, and reused to verify Drive's checksum once an upload ends.
+HASH_BLOCK = 8 * 1024 * 1024
+COPY_FIELDS = 'id, name, parents, md5Checksum, size, modifiedTime, mimeType'
+
+_hashes = {}
+_hash_lock = threading.Lock()
+dedup_stats = {'skipped': 0, 'copied': 0, 'bytes_saved': 0}
+
+def file_md5(file_path):
+    """MD5 hex digest of a file, computed once per (path, size, mtime)"""
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if key in _hashes:
+            return _hashes[key]
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    with _hash_lock:
+        _hashes[key] = digest.hexdigest()
+        return _hashes[key]
+
+def _count_saved(kind, size):
+    with _hash_lock:
+        dedup_stats[kind] += 1
+        dedup_stats['bytes_saved'] += size
+
+def _dedup(http, md5, size, name, folder_id):
+    """Return the id of an existing or server-side copied file with this content, or None"""
+    match = find_checksum(md5, folder_id)
+    if match is None or match['size'] != size:
+        return None
+    if match['parent'] == folder_id:
+        print(f"♻️ Skipping {name}: identical to '{match['name']}' already in the folder "
+              f"({size / (1024 * 1024):.1f}MB saved)")
+        _count_saved('skipped', size)
+        return match['id']
+    response = http.post(
+        f"https://www.googleapis.com/drive/v3/files/{match['id']}/copy",
+        params={'fields': COPY_FIELDS},
+        json={'name': name, 'parents': [folder_id]},
+        timeout=60
+    )
+    if response.status_code != 200:
+        print(f"⚠️ Server-side copy of '{match['name']}' failed ({response.status_code}), uploading {name}")
+        return None
+    resource = response.json()
+    record_created(resource)
+    print(f"♻️ Copied '{match['name']}' on Drive as {name} instead of uploading "
+          f"({size / (1024 * 1024):.1f}MB saved)")
+    _count_saved('copied', size)
+    return resource['id']
+
+def report_dedup():
+    if dedup_stats['skipped'] or dedup_stats['copied']:
+        print(f"♻️ Dedup: {dedup_stats['skipped']} skipped, {dedup_stats['copied']} copied, "
+              f"{dedup_stats['bytes_saved'] / (1024 * 1024):.1f}MB not uploaded")
+
+def _credentials(drive_service):
+    # The discovery client wraps its credentials in an AuthorizedHttp
+    return drive_service._http.credentials
+
+def _session_key(file_path, folder_id, name):
+    stat = os.stat(file_path)
+    raw = json.dumps([os.path.abspath(file_path), stat.st_size, int(stat.st_mtime), folder_id, name])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _next_chunk_size(chunk_bytes, seconds):
+    rate = chunk_bytes / max(seconds, 0.001)
+    size = int(rate * TARGET_CHUNK_SECONDS) // CHUNK_UNIT * CHUNK_UNIT
+    return max(MIN_CHUNK, min(MAX_CHUNK, size))
+
+def upload_file(drive_service, file_path, folder_id, name=None, mimetype=None, credentials=None, throttle=None):
+    """
+    Upload a local file into a Drive folder through a resumable session.
+    `throttle`, if given, is a BandwidthLimiter shared with other uploads.
+    Returns the new file id. Raises UploadError once retries are exhausted.
+    """
+    name = name or os.path.basename(file_path)
+    mimetype = mimetype or mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+    size = os.path.getsize(file_path)
+    http = AuthorizedSession(credentials or _credentials(drive_service))
+    md5 = file_md5(file_path)
+    existing = _dedup(http, md5, size, name, folder_id)
+    if existing:
+        return existing
+    key = _session_key(file_path, folder_id, name)
+
+    session_uri = sessions.get(key)
+    offset = _query_offset(http, session_uri, size) if session_uri else None
+    if isinstance(offset, dict):
+        # The previous run finished but crashed before clearing its session
+        sessions.delete(key)
+        sessions.save()
+        record_created(offset)
+        return offset['id']
+    if offset is None:
+        session_uri = _start_session(http, name, folder_id, mimetype, size)
+        sessions.set(key, session_uri)
+        sessions.save()
+        offset = 0
+    else:
+        print(f"🔁 Resuming upload of {name} at {offset / (1024 * 1024):.1f}MB")
+
+    start = time.time()
+    resumed_from = offset
+    chunk_size = INITIAL_CHUNK
+    retries = 0
+    with open(file_path, 'rb') as f:
+        while True:
+            f.seek(offset)
+            data = f.read(chunk_size)
+            end = offset + len(data) - 1
+            headers = {'Content-Range': f"bytes {offset}-{end}/{size}" if data else f"bytes */{size}"}
+            if throttle:
+                throttle.consume(len(data))
+            sent = time.time()
+            try:
+                response = http.put(session_uri, data=data, headers=headers, timeout=120)
+            except requests.RequestException as e:
+                response, error = None, e
+            else:
+                error = None if response.status_code in (200, 201, 308) else response.status_code
+
+            if error is None and response.status_code in (200, 201):
+                resource = response.json()
+                break
+            if error is None:
+                # 308: Drive acknowledged a prefix; the Range header says how much
+                offset = _acked_offset(response)
+                chunk_size = _next_chunk_size(len(data), time.time() - sent)
+                retries = 0
+                continue
+
+            retries += 1
+            if retries > MAX_RETRIES:
+                raise UploadError(f"Upload of {name} failed after {MAX_RETRIES} retries: {error}")
+            if response is not None and response.status_code in (404, 410):
+                # The session expired; start over with a fresh one (a folder
+                # that is gone keeps failing here until the retries run out)
+                delay = min(60, 2 ** retries)
+                print(f"⚠️ Upload session for {name} expired ({error}), restarting in {delay}s")
+                time.sleep(delay)
+                session_uri = _start_session(http, name, folder_id, mimetype, size)
+                sessions.set(key, session_uri)
+                sessions.save()
+                offset = resumed_from = 0
+            elif response is not None and 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+                raise UploadError(f"Upload of {name} failed: {error}")
+            else:
+                delay = min(60, 2 ** retries)
+                print(f"⚠️ Upload of {name} interrupted ({error}), resuming in {delay}s")
+                time.sleep(delay)
+                chunk_size = max(MIN_CHUNK, chunk_size // 2)
+                status = _query_offset(http, session_uri, size)
+                if isinstance(status, dict):
+                    resource = status
+                    break
+                if status is not None:
+                    offset = status
+
+    sessions.delete(key)
+    sessions.save()
+    if resource.get('md5Checksum') and resource['md5Checksum'] != md5:
+        print(f"⚠️ Drive checksum of {name} does not match the local file")
+    record_created(resource)
+    elapsed = max(time.time() - start, 0.001)
+    mb = (size - resumed_from) / (1024 * 1024)
+    print(f"📤 Uploaded {name}: {mb:.1f}MB in {elapsed:.1f}s ({mb / elapsed:.2f} MB/s)")
+    return resource['id']
+
+def _start_session(http, name, folder_id, mimetype, size):
+    response = http.post(
+        UPLOAD_URL,
+        json={'name': name, 'parents': [folder_id]},
+        headers={'X-Upload-Content-Type': mimetype, 'X-Upload-Content-Length': str(size)},
+        timeout=60
+    )
+    if response.status_code != 200:
+        raise UploadError(f"Could not start upload session for {name}: {response.status_code} {response.text[:200]}")
+    return response.headers['Location']
+
+def _acked_offset(response):
+    # Range: bytes=0-1048575 -> next offset 1048576; no header means nothing stored yet
+    acked = response.headers.get('Range')
+    return int(acked.rsplit('-', 1)[1]) + 1 if acked else 0
+
+def _query_offset(http, session_uri, size):
+    """
+    Ask Drive how much of a session it has. Returns the next offset, the
+    file resource if the upload already completed, or None if the session
+    is gone.
+    """
+    try:
+        response = http.put(session_uri, headers={'Content-Range': f"bytes */{size}"}, timeout=30)
+    except requests.RequestException:
+        return None
+    if response.status_code in (200, 201):
+        return response.json()
+    if response.status_code == 308:
+        return _acked_offset(response)
+    return None
+
+# ------------------ Concurrent Uploads ------------------
+# The discovery client's httplib2 transport is not thread-safe, so parallel
+# uploads never share it: each upload_file() call opens its own
+# AuthorizedSession, and all workers share one byte-rate limiter.
+UPLOAD_WORKERS = 4
+UPLOAD_BANDWIDTH_MBPS = 40         # total across all workers
+FILE_ATTEMPTS = 2
+
+class BandwidthLimiter:
+    """Token bucket over bytes, shared by concurrent uploads"""
+
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self.allowance = 0.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n):
+        with self._lock:
+            now = time.monotonic()
+            # Allow at most one second of burst
+            self.allowance = min(self.rate, self.allowance + (now - self.updated) * self.rate)
+            self.updated = now
+            self.allowance -= n
+            wait = -self.allowance / self.rate if self.allowance < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+def upload_many(drive_service, paths, folder_id, max_workers=UPLOAD_WORKERS, max_mbps=UPLOAD_BANDWIDTH_MBPS):
+    """
+    Upload several files into one folder concurrently, retrying each file
+    once. Returns [(path, file_id or None, error or None)] in input order.
+    """
+    credentials = _credentials(drive_service)
+    # Fetch the token once up front so workers don't all race to refresh it
+    if not credentials.valid:
+        credentials.refresh(Request())
+    throttle = BandwidthLimiter(max_mbps * 1024 * 1024) if max_mbps else None
+
+    def _upload(path):
+        error = None
+        for attempt in range(1, FILE_ATTEMPTS + 1):
+            try:
+                return path, upload_file(None, path, folder_id, credentials=credentials, throttle=throttle), None
+            except Exception as e:
+                error = e
+                print(f"⚠️ Upload attempt {attempt}/{FILE_ATTEMPTS} failed for {os.path.basename(path)}: {e}")
+        return path, None, error
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(_upload, paths))
+    total = sum(os.path.getsize(p) for p, file_id, _ in results if file_id) / (1024 * 1024)
+    elapsed = max(time.time() - start, 0.001)
+    print(f"📤 Uploaded {sum(1 for r in results if r[1])}/{len(results)} files, "
+          f"{total:.1f}MB in {elapsed:.1f}s ({total / elapsed:.2f} MB/s)")
+    report_dedup()
+    return results
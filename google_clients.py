@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime, timedelta
+import httplib2
+import google_auth_httplib2
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+# ------------------ Google Client Factory ------------------
+# Credentials are parsed once per (secret, scopes) and their access tokens
+# refreshed shortly before expiry. Services are built from the discovery
+# documents bundled with google-api-python-client (no network fetch) and
+# cached per thread, each thread getting its own keep-alive httplib2
+# transport since those are not thread-safe. The first API call made by each
+# service is timed from process start and logged.
+REFRESH_MARGIN = timedelta(minutes=5)
+HTTP_TIMEOUT = 120
+
+_started = time.monotonic()
+_credentials = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+def _fresh(creds):
+    """Refresh the access token if it is missing or about to expire"""
+    expiry = getattr(creds, 'expiry', None)
+    if not creds.token or (expiry and expiry - REFRESH_MARGIN < datetime.utcnow()):
+        creds.refresh(Request())
+    return creds
+
+def service_account_credentials(scopes, env='GDRIVE_SERVICE_ACCOUNT'):
+    """Cached service-account credentials read from a JSON secret in `env`"""
+    key = ('sa', env, tuple(scopes))
+    with _lock:
+        if key not in _credentials:
+            _credentials[key] = service_account.Credentials.from_service_account_info(
+                json.loads(os.environ[env]), scopes=list(scopes)
+            )
+        return _fresh(_credentials[key])
+
+def user_credentials(env, scopes):
+    """Cached OAuth user credentials (authorized-user JSON) read from `env`"""
+    key = ('user', env, tuple(scopes))
+    with _lock:
+        if key not in _credentials:
+            _credentials[key] = Credentials.from_authorized_user_info(
+                json.loads(os.environ[env]), scopes=list(scopes)
+            )
+        return _fresh(_credentials[key])
+
+class _TimedHttp(google_auth_httplib2.AuthorizedHttp):
+    """AuthorizedHttp that logs how long after start-up its first request finished"""
+
+    def __init__(self, credentials, label):
+        super().__init__(credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+        self.label = label
+        self.first_call = None
+
+    def request(self, *args, **kwargs):
+        result = super().request(*args, **kwargs)
+        if self.first_call is None:
+            self.first_call = time.monotonic() - _started
+            print(f"⏱️ {self.label}: first API call done {self.first_call:.2f}s after start")
+        return result
+
+def get_service(name, version, credentials):
+    """A discovery service for this thread, built once from the static discovery doc"""
+    services = getattr(_local, 'services', None)
+    if services is None:
+        services = _local.services = {}
+    key = (name, version, id(credentials))
+    if key not in services:
+        _fresh(credentials)
+        http = _TimedHttp(credentials, f"{name} {version}")
+        services[key] = build(name, version, http=http, static_discovery=True, cache_discovery=False)
+    return services[key]
+
+def service_account_file_credentials(path, scopes):
+    """Cached service-account credentials read from a key file"""
+    key = ('file', path, tuple(scopes))
+    with _lock:
+        if key not in _credentials:
+            _credentials[key] = service_account.Credentials.from_service_account_file(path, scopes=list(scopes))
+        return _fresh(_credentials[key])
+
+def get_drive_service(scopes=('https://www.googleapis.com/auth/drive',), env='GDRIVE_SERVICE_ACCOUNT'):
+    """This thread's Drive v3 client for the service account in `env`"""
+    return get_service('drive', 'v3', service_account_credentials(scopes, env))
+
+# ------------------ gspread ------------------
+_gspread = {}
+
+def gspread_client(scopes, env):
+    """Cached authorized gspread client"""
+    import gspread
+    key = (env, tuple(scopes))
+    with _lock:
+        if key not in _gspread:
+            started = time.monotonic()
+            creds = service_account.Credentials.from_service_account_info(
+                json.loads(os.environ[env]), scopes=list(scopes)
+            )
+            _gspread[key] = gspread.authorize(creds)
+            print(f"⏱️ gspread: authorized in {time.monotonic() - started:.2f}s")
+        return _gspread[key]
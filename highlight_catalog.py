@@ -0,0 +1,137 @@
+import os
+import re
+import math
+import difflib
+import requests
+from cache_store import JsonCache
+
+# ------------------ Highlight Catalog ------------------
+# The highlights feed is paged through once per run (and reused from disk for
+# CATALOG_TTL seconds) instead of being re-downloaded for every search. Every
+# highlight's title and description go into an in-memory inverted index;
+# query words that are not in the index are matched to close spellings, so
+# "Mahomes TD" still finds "Patrick Mahomes touchdown pass". All queries are
+# then ranked locally and each gets the best highlight no earlier query took.
+HIGHLIGHTS_URL = "https://sport-highlights-api.p.rapidapi.com/american-football/highlights"
+API_HOST = "sport-highlights-api.p.rapidapi.com"
+PAGE_SIZE = 40
+MAX_PAGES = 10
+CATALOG_TTL = 6 * 3600
+FUZZY_CUTOFF = 0.8
+TITLE_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+MEDIA_FIELDS = ('id', 'title', 'description', 'url', 'videoUrl', 'mediaUrl', 'embedUrl', 'imgUrl',
+                'source', 'channel', 'match')
+
+SYNONYMS = {'td': 'touchdown', 'tds': 'touchdowns', 'int': 'interception', 'qb': 'quarterback'}
+STOPWORDS = {'a', 'an', 'and', 'at', 'by', 'for', 'from', 'in', 'of', 'on', 'the', 'to', 'vs', 'with'}
+
+catalog_cache = JsonCache('highlight_catalog.json', ttl=CATALOG_TTL)
+
+def tokenize(text):
+    words = re.findall(r"[a-z0-9']+", (text or '').lower())
+    return [SYNONYMS.get(w, w) for w in words if w not in STOPWORDS]
+
+def media_url(item):
+    return item.get("url") or item.get("videoUrl") or item.get("mediaUrl")
+
+# ------------------ Fetching ------------------
+def fetch_highlights(league="NFL"):
+    """All highlights for `league`, from the disk cache or paged once from the API"""
+    cached = catalog_cache.get(league)
+    if cached is not None:
+        print(f"📚 Highlight catalog: {len(cached)} {league} highlights from cache")
+        return cached
+
+    headers = {
+        "x-rapidapi-key": os.getenv("RAPIDAPI_KEY"),
+        "x-rapidapi-host": API_HOST
+    }
+    items = []
+    with requests.Session() as session:
+        for page in range(MAX_PAGES):
+            params = {"leagueType": league, "limit": PAGE_SIZE, "offset": page * PAGE_SIZE}
+            resp = session.get(HIGHLIGHTS_URL, headers=headers, params=params, timeout=30)
+            try:
+                batch = resp.json().get("highlights") or []
+            except Exception:
+                print("API error or bad response:", resp.status_code, resp.text[:500])
+                break
+            items.extend({k: item[k] for k in MEDIA_FIELDS if k in item} for item in batch if media_url(item))
+            if len(batch) < PAGE_SIZE:
+                break
+    print(f"📚 Highlight catalog: fetched {len(items)} {league} highlights in {page + 1} page(s)")
+    if items:
+        catalog_cache.set(league, items)
+        catalog_cache.save()
+    return items
+
+# ------------------ Index ------------------
+class HighlightCatalog:
+    """Inverted word index over highlight titles and descriptions"""
+
+    def __init__(self, items):
+        self.items = items
+        self.postings = {}
+        for i, item in enumerate(items):
+            weights = {}
+            for word in tokenize(item.get('description')):
+                weights[word] = DESCRIPTION_WEIGHT
+            for word in tokenize(item.get('title')):
+                weights[word] = TITLE_WEIGHT
+            for word, weight in weights.items():
+                self.postings.setdefault(word, {})[i] = weight
+        self.vocabulary = list(self.postings)
+
+    def idf(self, word):
+        return math.log(1 + len(self.items) / len(self.postings[word]))
+
+    def _expand(self, word):
+        """[(indexed_word, similarity)] for a query word, exact first, else close spellings"""
+        if word in self.postings:
+            return [(word, 1.0)]
+        close = difflib.get_close_matches(word, self.vocabulary, n=3, cutoff=FUZZY_CUTOFF)
+        return [(w, difflib.SequenceMatcher(None, word, w).ratio()) for w in close]
+
+    def rank(self, query):
+        """[(score, item_index)] best first; the score is normalised to the query's best possible"""
+        words = set(tokenize(query))
+        scores = {}
+        best_possible = 0.0
+        for word in words:
+            expansions = self._expand(word)
+            if not expansions:
+                best_possible += math.log(1 + len(self.items))
+                continue
+            best_possible += TITLE_WEIGHT * max(self.idf(w) for w, _ in expansions)
+            for indexed, similarity in expansions:
+                idf = self.idf(indexed)
+                for i, weight in self.postings[indexed].items():
+                    scores[i] = scores.get(i, 0.0) + weight * idf * similarity
+        if not best_possible:
+            return []
+        return sorted(((s / best_possible, i) for i, s in scores.items()), key=lambda t: (-t[0], t[1]))
+
+    def match_all(self, queries, count):
+        """
+        Pick up to `count` distinct highlights for `queries`, in order: every
+        query takes its best-ranked highlight not already taken. Returns
+        dicts with the media metadata plus 'query' and 'score'.
+        """
+        taken = set()
+        picks = []
+        for query in queries:
+            for score, i in self.rank(query):
+                url = media_url(self.items[i])
+                if url not in taken:
+                    taken.add(url)
+                    picks.append(dict(self.items[i], query=query, score=round(score, 3)))
+                    break
+            if len(picks) >= count:
+                break
+        return picks
+
+    def latest(self, count, exclude=()):
+        """Fallback: the newest highlights (feed order) not in `exclude`"""
+        return [dict(item, query=None, score=0.0) for item in self.items
+                if media_url(item) not in exclude][:count]
@@ -0,0 +1,100 @@
+import random
+from cache_store import JsonCache
+
+# ------------------ Top-5 Idea Queue ------------------
+# The idea sheet only ever needs two things per run: which rows are still
+# unused, and the one row that gets picked. The queue reads the header, the
+# title column and the "Used?" column with a single ranged batch_get and
+# keeps the unused row numbers in a local cache keyed on the spreadsheet's
+# Drive modifiedTime, so an unchanged sheet costs one files.get. The chosen
+# row is fetched on its own and marked used through the same worksheet
+# handle.
+TITLE_HEADER = 'Title'
+USED_HEADER = 'Used?'
+DEFAULT_COLUMNS = {TITLE_HEADER: 1, USED_HEADER: 6}
+
+idea_cache = JsonCache('top5_ideas.json')
+
+def _column_letter(col):
+    letters = ''
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+def _column_range(col):
+    letter = _column_letter(col)
+    return f"{letter}2:{letter}"
+
+def _cell(values, i):
+    return values[i][0].strip() if i < len(values) and values[i] else ''
+
+class IdeaQueue:
+    """Unused rows of one worksheet, cached against the sheet's modified time"""
+
+    def __init__(self, client, drive_service, sheet_id, tab):
+        self.client = client
+        self.drive = drive_service
+        self.sheet_id = sheet_id
+        self.tab = tab
+        self.key = f"{sheet_id}:{tab}"
+        self._ws = None
+        self.state = None
+
+    @property
+    def ws(self):
+        if self._ws is None:
+            self._ws = self.client.open_by_key(self.sheet_id).worksheet(self.tab)
+        return self._ws
+
+    def _modified_time(self):
+        return self.drive.files().get(fileId=self.sheet_id, fields='modifiedTime').execute()['modifiedTime']
+
+    def _load(self, modified):
+        """Cached state if the sheet has not changed since it was read, else a fresh read"""
+        cached = idea_cache.get(self.key)
+        if cached and cached['modified'] == modified:
+            print(f"🗂️ Idea sheet unchanged since {modified}, {len(cached['unused'])} unused rows cached")
+            return cached
+
+        columns = (cached or {}).get('columns') or DEFAULT_COLUMNS
+        header, titles, used = self.ws.batch_get(
+            ['1:1', _column_range(columns[TITLE_HEADER]), _column_range(columns[USED_HEADER])]
+        )
+        header = header[0] if header else []
+        found = {name: header.index(name) + 1 for name in (TITLE_HEADER, USED_HEADER) if name in header}
+        if len(found) < 2:
+            raise Exception(f"Idea sheet is missing a '{TITLE_HEADER}' or '{USED_HEADER}' column")
+        if found != columns:
+            # Columns moved since the last read; fetch the right ones
+            titles, used = self.ws.batch_get([_column_range(found[TITLE_HEADER]), _column_range(found[USED_HEADER])])
+
+        unused = [i + 2 for i in range(len(titles))
+                  if _cell(titles, i) and _cell(used, i).lower() != 'yes']
+        state = {'modified': modified, 'header': header, 'columns': found, 'unused': unused}
+        idea_cache.set(self.key, state)
+        idea_cache.save()
+        print(f"🗂️ Read idea sheet columns: {len(unused)} unused of {len(titles)} rows")
+        return state
+
+    def next_unused(self):
+        """Pick a random unused idea; returns (row_dict, sheet_row_number)"""
+        self.state = self._load(self._modified_time())
+        if not self.state['unused']:
+            raise Exception("No unused ideas left!")
+        row_number = random.choice(self.state['unused'])
+        header = self.state['header']
+        last = _column_letter(len(header))
+        values = self.ws.batch_get([f"A{row_number}:{last}{row_number}"])[0]
+        values = values[0] if values else []
+        row = {name: values[i] if i < len(values) else '' for i, name in enumerate(header)}
+        return row, row_number
+
+    def mark_used(self, row_number):
+        """Set the row's "Used?" cell and keep the cache in step with the sheet"""
+        self.ws.update_cell(row_number, self.state['columns'][USED_HEADER], "Yes")
+        self.state['unused'] = [r for r in self.state['unused'] if r != row_number]
+        # Our own edit bumps modifiedTime; record it so the next run can still use the cache
+        self.state['modified'] = self._modified_time()
+        idea_cache.set(self.key, self.state)
+        idea_cache.save()
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import statistics
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from requests.adapters import HTTPAdapter
+
+# ------------------ OpenRouter Client ------------------
+# All OpenRouter traffic goes through one keep-alive session and one token
+# bucket. Each call has a latency budget and walks an ordered model chain:
+# the primary model first, then its fallbacks. With hedge=True a second model
+# is started once the first has been silent for its typical (p50) latency,
+# and whichever answers first wins. Per-model latency/error stats are
+# printed by report_llm_stats() to help pick the fastest reliable model.
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+DEFAULT_TIMEOUT = 30         # latency budget per call, in seconds
+RATE_PER_SECOND = 1.0        # steady-state request rate shared by all threads
+RATE_BURST = 5
+MAX_RETRY_AFTER = 20         # never sleep longer than this for one 429
+HEDGE_MIN_DELAY = 1.0        # don't hedge before this even if p50 is lower
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+            _session.headers.update({"Content-Type": "application/json"})
+        return _session
+
+class RateLimitError(Exception):
+    def __init__(self, model, retry_after):
+        super().__init__(f"{model} rate limited (retry after {retry_after:.0f}s)")
+        self.retry_after = retry_after
+
+# ------------------ Token Bucket ------------------
+class TokenBucket:
+    """Thread-safe token bucket; pause() empties it for a 429's Retry-After"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """Wait for a token; returns False if it can't be had before `deadline`"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait_for = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            if deadline is not None and time.monotonic() + wait_for > deadline:
+                return False
+            time.sleep(wait_for)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+rate_limiter = TokenBucket(RATE_PER_SECOND, RATE_BURST)
+
+# ------------------ Per-model Stats ------------------
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _record(model, latency=None, error=None):
+    with _stats_lock:
+        entry = _stats.setdefault(model, {'calls': 0, 'errors': 0, 'latencies': []})
+        entry['calls'] += 1
+        if error is not None:
+            entry['errors'] += 1
+        else:
+            entry['latencies'].append(latency)
+
+def model_p50(model, default):
+    with _stats_lock:
+        latencies = _stats.get(model, {}).get('latencies')
+        return statistics.median(latencies) if latencies else default
+
+def report_llm_stats():
+    with _stats_lock:
+        for model, entry in sorted(_stats.items()):
+            latencies = sorted(entry['latencies'])
+            if latencies:
+                p50 = statistics.median(latencies)
+                p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                timing = f"p50 {p50:.1f}s, p95 {p95:.1f}s"
+            else:
+                timing = "no successful calls"
+            print(f"🤖 {model}: {entry['calls']} calls, "
+                  f"{entry['errors'] / entry['calls']:.0%} errors, {timing}")
+
+# ------------------ Requests ------------------
+def chat_completion(model, messages, max_tokens=500, temperature=0.7, timeout=DEFAULT_TIMEOUT,
+                    stop=None, fallbacks=(), hedge=False, with_model=False):
+    """
+    Send a chat completion to OpenRouter and return the message text, or
+    (text, answering_model) with `with_model=True`.
+
+    `model` is tried first, then each of `fallbacks`, all within a total
+    latency budget of `timeout` seconds. With a `stop` condition (see below)
+    the response is streamed and the connection is closed as soon as the
+    condition is met. Raises the last error if every model fails.
+    """
+    text, used = _complete(model, messages, max_tokens, temperature, timeout, stop, fallbacks, hedge)
+    return (text, used) if with_model else text
+
+def _complete(model, messages, max_tokens, temperature, timeout, stop, fallbacks, hedge):
+    """chat_completion's fallback/hedging loop; returns (text, answering_model)"""
+    chain = [model] + [m for m in fallbacks if m != model]
+    deadline = time.monotonic() + timeout
+    request = dict(messages=messages, max_tokens=max_tokens, temperature=temperature, stop=stop)
+    last_error = None
+
+    while chain and time.monotonic() < deadline:
+        if hedge and len(chain) > 1:
+            try:
+                return _hedged(chain[0], chain[1], request, deadline)
+            except Exception as e:
+                last_error = e
+                chain = chain[2:]
+            continue
+        current = chain.pop(0)
+        try:
+            return _attempt(current, request, deadline), current
+        except RateLimitError as e:
+            last_error = e
+            # Retry the same model once if the wait fits in the budget
+            if e.retry_after < deadline - time.monotonic():
+                try:
+                    return _attempt(current, request, deadline), current
+                except Exception as e2:
+                    last_error = e2
+        except Exception as e:
+            last_error = e
+        print(f"⚠️ {current} failed: {last_error}")
+
+    raise last_error or TimeoutError("LLM latency budget exhausted")
+
+def _hedged(primary, backup, request, deadline):
+    """
+    Race `backup` against `primary` once primary exceeds its usual latency.
+    Returns (text, model) from whichever answered first.
+    """
+    cancel = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=2)
+    try:
+        futures = [pool.submit(_attempt, primary, request, deadline, cancel)]
+        models = {futures[0]: primary}
+        delay = max(HEDGE_MIN_DELAY, model_p50(primary, (deadline - time.monotonic()) / 2))
+        done, _ = wait(futures, timeout=delay)
+        if not done or futures[0].exception() is not None:
+            if done:
+                print(f"⚠️ {primary} failed: {futures[0].exception()}")
+            else:
+                print(f"⏱️ {primary} slower than {delay:.1f}s, hedging with {backup}")
+            futures.append(pool.submit(_attempt, backup, request, deadline, cancel))
+            models[futures[-1]] = backup
+
+        last_error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), models[future]
+                last_error = future.exception()
+        raise last_error or TimeoutError("LLM latency budget exhausted")
+    finally:
+        # The loser stops reading its stream; a non-streamed loser is just ignored
+        cancel.set()
+        pool.shutdown(wait=False)
+
+def _attempt(model, request, deadline, cancel=None):
+    """One rate-limited request to one model; records latency/errors"""
+    if not rate_limiter.acquire(deadline):
+        raise TimeoutError(f"rate limiter wait exceeds budget for {model}")
+    start = time.monotonic()
+    try:
+        text = _send(model, request, deadline, cancel)
+    except Exception as e:
+        _record(model, error=e)
+        raise
+    _record(model, latency=time.monotonic() - start)
+    return text
+
+def _send(model, request, deadline, cancel=None):
+    headers = {"Authorization": f"Bearer {os.environ['OPENROUTER_API_KEY']}"}
+    payload = {
+        "model": model,
+        "messages": request['messages'],
+        "max_tokens": request['max_tokens'],
+        "temperature": request['temperature']
+    }
+    stop = request['stop']
+    timeout = max(1.0, deadline - time.monotonic())
+    if stop is not None:
+        payload['stream'] = True
+
+    with get_session().post(OPENROUTER_URL, json=payload, headers=headers,
+                            timeout=timeout, stream=stop is not None) as response:
+        if response.status_code == 429:
+            retry_after = _retry_after(response)
+            rate_limiter.pause(retry_after)
+            raise RateLimitError(model, retry_after)
+        response.raise_for_status()
+        if stop is None:
+            return response.json()['choices'][0]['message']['content'].strip()
+
+        text = ''
+        for delta in _stream_deltas(response):
+            if (cancel is not None and cancel.is_set()) or time.monotonic() > deadline:
+                raise TimeoutError(f"{model} stream abandoned")
+            text += delta
+            result = stop(text)
+            if result is not None:
+                # Leaving the with-block closes the connection, which ends generation
+                return result.strip()
+        return text.strip()
+
+def _retry_after(response):
+    try:
+        seconds = float(response.headers.get('Retry-After', 5))
+    except ValueError:
+        seconds = 5.0
+    return min(max(seconds, 1.0), MAX_RETRY_AFTER)
+
+def _stream_deltas(response):
+    """Yield content deltas from an OpenRouter server-sent event stream"""
+    # text/event-stream comes without a charset, which requests would read as
+    # ISO-8859-1; SSE is always UTF-8
+    response.encoding = 'utf-8'
+    for line in response.iter_lines(decode_unicode=True):
+        # Blank keep-alives and ': OPENROUTER PROCESSING' comments carry no data
+        if not line or not line.startswith('data:'):
+            continue
+        data = line[5:].strip()
+        if data == '[DONE]':
+            return
+        event = json.loads(data)
+        if 'error' in event:
+            raise RuntimeError(f"OpenRouter stream error: {event['error']}")
+        choices = event.get('choices') or [{}]
+        delta = (choices[0].get('delta') or {}).get('content')
+        if delta:
+            yield delta
+
+# ------------------ Stop Conditions ------------------
+# A stop condition takes the text streamed so far and returns the final text
+# once it has everything it needs, or None to keep reading.
+def stop_at_first_line():
+    """Stop after the first non-blank line"""
+    def stop(text):
+        text = text.lstrip()
+        if '\n' in text:
+            return text.split('\n', 1)[0]
+        return None
+    return stop
+
+def stop_at_chars(limit):
+    """Stop once `limit` characters have arrived"""
+    def stop(text):
+        return text[:limit] if len(text) >= limit else None
+    return stop
+
+def stop_at_json():
+    """Stop after the first complete JSON object or array"""
+    decoder = json.JSONDecoder()
+    def stop(text):
+        starts = [i for i in (text.find('{'), text.find('[')) if i != -1]
+        if not starts or text.rstrip()[-1] not in '}]':
+            return None
+        start = min(starts)
+        try:
+            _, end = decoder.raw_decode(text, start)
+        except ValueError:
+            return None
+        return text[start:end]
+    return stop
+
+def stop_at_any(*conditions):
+    """Stop as soon as any of the given conditions is met"""
+    def stop(text):
+        for condition in conditions:
+            result = condition(text)
+            if result is not None:
+                return result
+        return None
+    return stop
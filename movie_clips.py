@@ -1,40 +1,55 @@
 import os
 import re
 import subprocess
-import requests
 import textwrap
 from yt_dlp import YoutubeDL
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from yt_dlp.utils import download_range_func
+from google_clients import get_service, service_account_file_credentials
+from drive_uploader import upload_file
+from drive_index import get_drive_index
 from PIL import Image, ImageDraw, ImageFont
+from video_fingerprint import check_duplicate, register_upload
+from concurrent.futures import ThreadPoolExecutor
+from llm_client import chat_completion, stop_at_first_line
+from captions import caption_one, generate_captions, normalize_title, report_caption_cache
+from cache_store import JsonCache
+from scene_locator import locate_scene, pick_subtitle_track
 
 # ── Configuration ──────────────────────────────────────────────────────────────
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 DRIVE_FOLDER_ID    = "1Hxw_9MI4qHGP8EHgiQ0nLkku_NNrY4fm"
 MODEL_ID           = "google/gemini-2.0-flash-lite-001"
-OPENROUTER_URL     = "https://openrouter.ai/api/v1/chat/completions"
+TITLE_MODEL_ID     = "mistralai/mistral-7b-instruct"  # Different model to avoid strict safety filters
+TITLE_PROMPT_VERSION = "movie-title-v1"
+SCENE_FALLBACK_MODELS = ["meta-llama/llama-3.3-70b-instruct:free"]
+TITLE_FALLBACK_MODELS = ["google/gemini-2.0-flash-lite-001"]
+
+SCENE_CACHE_TTL = 90 * 24 * 3600
+
+# Search ranking: scene clips on YouTube are usually a few minutes long
+SEARCH_CANDIDATES = 5
+SCENE_PROFILE = {
+    "target_seconds": 150,
+    "min_seconds": 15,
+    "max_seconds": 900,       # longer uploads are full movies or compilations...
+    "max_long_seconds": 4 * 3600,  # ...only usable when captions can locate the scene
+    "max_height": 1080,
+    "min_height": 360,
+}
+MAX_FILESIZE = 300 * 1024 * 1024
+LONG_UPLOAD_SECONDS = 600     # above this, download only the caption-located window
 
 TMP_DIR = "temp_clips"
 os.makedirs(TMP_DIR, exist_ok=True)
 
 # ── Helper: ask OpenRouter for scenes ───────────────────────────────────────────
 def fetch_scenes(prompt):
-    resp = requests.post(
-        OPENROUTER_URL,
-        headers={
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-        },
-        json={
-            "model": MODEL_ID,
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 400,
-            "temperature": 0.7,
-        }
+    text = chat_completion(
+        MODEL_ID,
+        [{"role": "user", "content": prompt}],
+        max_tokens=400,
+        temperature=0.7,
+        fallbacks=SCENE_FALLBACK_MODELS
     )
-    resp.raise_for_status()
-    text = resp.json()["choices"][0]["message"]["content"]
     scenes = []
     for line in text.splitlines():
         if "–" in line:
@@ -47,36 +62,53 @@ def fetch_scenes(prompt):
     return scenes
 
 # ── Generate a creative title with OpenRouter ──────────────────────────────────
-def generate_creative_title(movie, scene):
-    prompt = (
-        f"You are a creative assistant for a social media account that posts movie clips. "
-        f"Your task is to generate a short, viral-style title for a specific movie scene. "
-        f"The title must be a single, short, all-words phrase in a 'POV:' or 'When...' format. Do NOT use any emojis at the start or in the middle—ONLY add 1 or 2 relevant emojis at the very end as context or punchline. Do NOT include the movie name or a scene description in the title.\n\n"
+TITLE_RULES = (
+    "You are a creative assistant for a social media account that posts movie clips. "
+    "Your task is to generate a short, viral-style title for a specific movie scene. "
+    "The title must be a single, short, all-words phrase in a 'POV:' or 'When...' format. Do NOT use any emojis at the start or in the middle—ONLY add 1 or 2 relevant emojis at the very end as context or punchline. Do NOT include the movie name or a scene description in the title."
+)
+
+def scene_key(movie, scene):
+    return f"{movie} – {scene}"
+
+def _title_prompt(pair):
+    movie, scene = pair
+    return (
+        f"{TITLE_RULES}\n\n"
         f"Movie: {movie}\n"
         f"Scene: {scene}\n\n"
         f"Respond with ONLY the creative title."
     )
-    try:
-        resp = requests.post(
-            OPENROUTER_URL,
-            headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": "mistralai/mistral-7b-instruct", # Using a different model to avoid strict safety filters
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 60,
-                "temperature": 0.7,
-            }
-        )
-        resp.raise_for_status()
-        title = resp.json()["choices"][0]["message"]["content"].strip()
-        # Final cleanup to remove any accidental quotes
-        return title.replace('"', '').replace("'", "")
-    except requests.exceptions.HTTPError as e:
-        print(f"   ⚠️ Could not generate creative title (API Error: {e}). Falling back to movie title.")
-        return movie
+
+def _clean_title(text):
+    # Final cleanup to remove any accidental quotes
+    return text.strip().replace('"', '').replace("'", "")
+
+def _fallback_title(pair):
+    print("   ⚠️ Could not generate creative title. Falling back to movie title.")
+    return pair[0]
+
+TITLE_SPEC = {
+    'model': TITLE_MODEL_ID,
+    'version': TITLE_PROMPT_VERSION,
+    'fallbacks': TITLE_FALLBACK_MODELS,
+    'instructions': TITLE_RULES + " Each input is 'Movie – Scene'.",
+    # Items are (movie, scene) pairs; the joined form keys the cache and batch prompt
+    'text': lambda pair: scene_key(*pair),
+    'prompt': _title_prompt,
+    'postprocess': _clean_title,
+    'fallback': _fallback_title,
+    'stop': stop_at_first_line(),
+    'max_tokens': 60,
+    'temperature': 0.7
+}
+
+def generate_creative_title(movie, scene):
+    return caption_one((movie, scene), TITLE_SPEC)
+
+def generate_creative_titles(scenes):
+    """Titles for every (movie, scene) pair in about one round trip"""
+    return generate_captions(list(scenes), TITLE_SPEC)
 
 # ── Create dynamic title bubble ────────────────────────────────────────────────
 def create_dynamic_bubble(text, font_path, font_size, output_path):
@@ -122,47 +154,171 @@ def get_target_scenes():
         "Respond each on a new line, only as: Movie Title – Brief, descriptive scene name (under 10 words). "
         "Do not use list numbers."
     )
-    funny = fetch_scenes(funny_prompt)      # returns [(movie,scene)]
-    classic = fetch_scenes(classic_prompt)  # returns [(movie,scene), …]
-    return funny + classic                  # total of 3 items
+    # Both prompts are independent, so ask for them concurrently
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        funny = pool.submit(fetch_scenes, funny_prompt)      # returns [(movie,scene)]
+        classic = pool.submit(fetch_scenes, classic_prompt)  # returns [(movie,scene), …]
+        return funny.result() + classic.result()             # total of 3 items
 
-# ── Drive client init ───────────────────────────────────────────────────────────
-def init_drive():
-    creds = Credentials.from_service_account_file(
-        "service_account.json",
-        scopes=["https://www.googleapis.com/auth/drive"]
-    )
-    return build("drive", "v3", credentials=creds)
+# ── Scene-resolution cache ─────────────────────────────────────────────────────
+# The LLM keeps suggesting the same iconic scenes. Each resolved scene is
+# remembered as {video_id, start, end, title, file_name, uploaded} so repeats
+# skip the YouTube search, and scenes that are already on Drive are dropped
+# before any title generation or download.
+scene_cache = JsonCache('movie_scenes.json', ttl=SCENE_CACHE_TTL)
+
+def scene_cache_key(movie, scene):
+    return normalize_title(scene_key(movie, scene))
+
+def remember_scene(movie, scene, **fields):
+    key = scene_cache_key(movie, scene)
+    entry = dict(scene_cache.get(key) or {})
+    entry.update(fields)
+    scene_cache.set(key, entry)
+    scene_cache.save()
+
+def forget_video(movie, scene):
+    """Drop a scene's cached YouTube match (e.g. the video was removed) so it is searched again"""
+    key = scene_cache_key(movie, scene)
+    entry = scene_cache.get(key)
+    if entry is None:
+        return
+    entry = {k: v for k, v in entry.items() if k not in ('video_id', 'start', 'end')}
+    scene_cache.set(key, entry)
+    scene_cache.save()
+
+def filter_known_scenes(scenes):
+    """Drop scenes that were already uploaded; returns the remaining scenes"""
+    remaining = []
+    for movie, scene in scenes:
+        entry = scene_cache.get(scene_cache_key(movie, scene)) or {}
+        if entry.get('uploaded'):
+            print(f"→ Skipping known scene '{movie} – {scene}' (uploaded as '{entry.get('file_name')}')")
+            continue
+        if entry.get('file_name') and already_uploaded(entry['file_name']):
+            remember_scene(movie, scene, uploaded=True)
+            print(f"→ Skipping known scene '{movie} – {scene}' (found '{entry['file_name']}' on Drive)")
+            continue
+        remaining.append((movie, scene))
+    return remaining
 
-drive_service = init_drive()
+# ── Drive client init ───────────────────────────────────────────────────────────
+def drive():
+    # Built lazily (and once per thread) so importing this module needs no key file
+    creds = service_account_file_credentials("service_account.json", ["https://www.googleapis.com/auth/drive"])
+    return get_service("drive", "v3", creds)
 
 # ── Check duplicate in Drive ────────────────────────────────────────────────────
 def already_uploaded(name):
-    # Escape single quotes in the filename for the Drive API query.
-    escaped_name = name.replace("'", "\\'")
-    q = f"name='{escaped_name}' and '{DRIVE_FOLDER_ID}' in parents and trashed=false"
-    res = drive_service.files().list(q=q, fields="files(id)").execute()
-    return bool(res.get("files"))
+    # Local query against the synced Drive index, no API round trip
+    return get_drive_index(drive()).exists(name, DRIVE_FOLDER_ID)
+
+# ── Find the best YouTube match ─────────────────────────────────────────────────
+def _words(text):
+    return set(re.findall(r"[a-z0-9]+", (text or "").lower()))
+
+def _max_height(info):
+    heights = [f.get("height") or 0 for f in info.get("formats") or [] if f.get("vcodec") != "none"]
+    return max(heights, default=info.get("height") or 0)
+
+def score_candidate(info, movie, scene):
+    """Rank a search hit by duration fit, title match and resolution; None = rejected"""
+    duration = info.get("duration") or 0
+    height = _max_height(info)
+    long_ok = duration <= SCENE_PROFILE["max_long_seconds"] and pick_subtitle_track(info)[0]
+    if duration < SCENE_PROFILE["min_seconds"] or (duration > SCENE_PROFILE["max_seconds"] and not long_ok):
+        return None, f"duration {duration}s"
+    if height and height < SCENE_PROFILE["min_height"]:
+        return None, f"only {height}p"
+
+    target = SCENE_PROFILE["target_seconds"]
+    duration_fit = 1 - min(1.0, abs(duration - target) / SCENE_PROFILE["max_seconds"])
+    wanted = _words(f"{movie} {scene}")
+    title_match = len(wanted & _words(info.get("title"))) / len(wanted) if wanted else 0
+    resolution = min(height, SCENE_PROFILE["max_height"]) / SCENE_PROFILE["max_height"] if height else 0.5
+    return 0.45 * duration_fit + 0.4 * title_match + 0.15 * resolution, None
+
+def find_best_video(movie, scene):
+    """
+    Fetch metadata for the top search hits (no download) and return
+    (info, section) for the best one. `section` is the (start, end) window
+    located via captions for long uploads, else None.
+    """
+    query = f"ytsearch{SEARCH_CANDIDATES}:{movie} {scene} scene"
+    opts = {"quiet": True, "noplaylist": True, "cookiefile": "YT_Cookies.txt", "ignoreerrors": True}
+    with YoutubeDL(opts) as ydl:
+        try:
+            results = ydl.extract_info(query, download=False)
+        except Exception as e:
+            print(f"❌ YouTube search failed: {e}")
+            return None, None
+        entries = [e for e in (results or {}).get("entries") or [] if e]
+        if not entries:
+            print("   → No search results found on YouTube.")
+            return None, None
+
+        ranked, rejected = [], []
+        for info in entries:
+            score, reason = score_candidate(info, movie, scene)
+            if score is None:
+                rejected.append(f"'{info.get('title')}' ({reason})")
+            else:
+                ranked.append((score, info))
+
+        for score, best in sorted(ranked, key=lambda pair: pair[0], reverse=True):
+            section = None
+            if (best.get("duration") or 0) > LONG_UPLOAD_SECONDS:
+                section = _locate_in_captions(ydl, best, scene)
+                if not section:
+                    rejected.append(f"'{best.get('title')}' (long upload, scene not found in captions)")
+                    continue
+            print(f"   → Best match: '{best.get('title')}' ({best.get('duration')}s, {_max_height(best)}p, "
+                  f"score {score:.2f}, {len(rejected)} rejected)")
+            return best, section
+
+    print(f"   → All {len(entries)} candidates rejected: {'; '.join(rejected)}")
+    return None, None
+
+def _locate_in_captions(ydl, info, scene):
+    try:
+        section = locate_scene(info, scene, lambda url: ydl.urlopen(url).read().decode("utf-8", "replace"))
+    except Exception as e:
+        print(f"   ⚠️ Caption lookup failed for '{info.get('title')}': {e}")
+        return None
+    if section:
+        print(f"   → Scene located in captions at {section[0]:.0f}s–{section[1]:.0f}s")
+    return section
 
 # ── Download from YouTube ───────────────────────────────────────────────────────
-def download_clip(search_term):
+def download_clip(video_id, section=None):
+    """
+    Download one video under the resolution/size caps, or only the
+    (start, end) `section` of it. Returns the local path or None.
+    """
+    height = SCENE_PROFILE["max_height"]
     opts = {
-        "format": "bestvideo+bestaudio/best",
+        "format": f"bestvideo[height<={height}]+bestaudio/best[height<={height}]/best",
         "outtmpl": f"{TMP_DIR}/%(id)s.%(ext)s",
         "noplaylist": True,
         "quiet": True,
-        "default_search": "ytsearch1",
         "cookiefile": "YT_Cookies.txt",
     }
+    if section:
+        # Only the window is fetched, so the whole-file size cap doesn't apply
+        opts["outtmpl"] = f"{TMP_DIR}/%(id)s_{int(section[0])}.%(ext)s"
+        opts["download_ranges"] = download_range_func(None, [section])
+        opts["force_keyframes_at_cuts"] = True
+    else:
+        opts["max_filesize"] = MAX_FILESIZE
     with YoutubeDL(opts) as ydl:
         try:
-            info = ydl.extract_info(search_term, download=True)
-            # Handle cases where search yields no results
-            if info and info.get("entries"):
-                entry = info["entries"][0]
-                return ydl.prepare_filename(entry)
-            print("   → No search results found on YouTube.")
-            return None
+            info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=True)
+            path = ydl.prepare_filename(info) if info else None
+            if not path or not os.path.exists(path):
+                # yt-dlp skips (rather than fails) downloads over max_filesize
+                print(f"   → Download skipped, over {MAX_FILESIZE // (1024 * 1024)}MB or unavailable.")
+                return None
+            return path
         except Exception as e:
             # Catch other download errors, e.g., video unavailable
             print(f"❌ YouTube download failed: {e}")
@@ -207,20 +363,22 @@ def upload_to_drive(local_path, name):
     if already_uploaded(name):
         print(f"Skipped (exists): {name}")
         return
-    meta  = {"name": name, "parents": [DRIVE_FOLDER_ID]}
-    media = MediaFileUpload(local_path, mimetype="video/mp4")
-    drive_service.files().create(body=meta, media_body=media).execute()
+    upload_file(drive(), local_path, DRIVE_FOLDER_ID, name=name, mimetype="video/mp4")
     print(f"Uploaded: {name}")
 
 # ── Main orchestration ─────────────────────────────────────────────────────────
 def main():
-    scenes = get_target_scenes()  # 1 funny + 2 classic
+    scenes = filter_known_scenes(get_target_scenes())  # 1 funny + 2 classic
     font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+    known = {(m, s): scene_cache.get(scene_cache_key(m, s)) or {} for m, s in scenes}
+    titles = generate_creative_titles([pair for pair in scenes if not known[pair].get('title')])
 
     for movie, scene in scenes:
         print(f"→ Processing scene from '{movie}': {scene}")
+        entry = known[(movie, scene)]
 
-        creative_title = generate_creative_title(movie, scene)
+        creative_title = (entry.get('title') or titles.get((movie, scene))
+                          or generate_creative_title(movie, scene))
         print(f"   → Creative title: '{creative_title}'")
         
         # Sanitize the creative title to be a valid filename
@@ -228,6 +386,7 @@ def main():
         
         if already_uploaded(safe_fname):
             print(f"   → Already uploaded as '{safe_fname}', skipping.")
+            remember_scene(movie, scene, title=creative_title, file_name=safe_fname, uploaded=True)
             continue
         
         # Create the dynamic title bubble image
@@ -239,19 +398,41 @@ def main():
             print(f"   ❌ Failed to generate dynamic title card: {e}")
             continue # Skip this clip if bubble generation fails
 
-        search_query = f"{movie} {scene} scene"
-        print(f"   → Downloading from YouTube with search: '{search_query}'")
-        downloaded_clip_path = download_clip(search_query)
+        video_id = entry.get('video_id')
+        section = (entry['start'], entry['end']) if entry.get('start') is not None else None
+        downloaded_clip_path = None
+        if video_id:
+            print(f"   → Known scene, downloading YouTube video {video_id}")
+            downloaded_clip_path = download_clip(video_id, section)
+            if not downloaded_clip_path:
+                # Removed or made private since it was cached; search again
+                print(f"   → Cached video {video_id} is unavailable, forgetting it")
+                forget_video(movie, scene)
+                video_id = None
+        if not video_id:
+            print(f"   → Searching YouTube for: '{movie} {scene} scene'")
+            best, section = find_best_video(movie, scene)
+            video_id = best.get("id") if best else None
+            downloaded_clip_path = download_clip(video_id, section) if video_id else None
 
         if not downloaded_clip_path:
             os.remove(temp_bubble_path) # Clean up if download fails
             continue
+        remember_scene(movie, scene, video_id=video_id,
+                       start=section[0] if section else None, end=section[1] if section else None,
+                       title=creative_title, file_name=safe_fname)
 
         output_video_path = os.path.join(TMP_DIR, safe_fname)
         
         try:
+            fingerprint, duplicate = check_duplicate(downloaded_clip_path)
+            if duplicate:
+                print(f"   → Same footage already uploaded as '{duplicate['name']}', skipping.")
+                continue
             transform_clip(downloaded_clip_path, output_video_path, temp_bubble_path)
             upload_to_drive(output_video_path, safe_fname)
+            register_upload(fingerprint, "Movies", safe_fname)
+            remember_scene(movie, scene, uploaded=True)
             print(f"   → Successfully processed and uploaded '{safe_fname}'")
         finally:
             # Ensure all temporary files are cleaned up
@@ -262,6 +443,8 @@ def main():
             if os.path.exists(output_video_path):
                 os.remove(output_video_path)
 
+    report_caption_cache()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,228 @@
+import os
+import html
+import yt_dlp
+import requests
+import cv2
+import numpy as np
+from cache_store import JsonCache, cache_path
+from watermark_detection import detect_static_overlay, _check_frame_for_tiktok_watermark
+
+# ------------------ Pre-download Screening ------------------
+# Runs watermark, near-duplicate and aspect/quality checks on cheap proxies
+# (Reddit preview image, thumbnail, lowest-bitrate rendition) so only
+# candidates that pass trigger the full-quality download.
+SCREEN_TTL = 7 * 24 * 3600
+MIN_DURATION = 10
+MAX_DURATION = 180
+MIN_LONG_SIDE = 480          # reject tiny renditions (e.g. 360x240 screen grabs)
+MIN_ASPECT, MAX_ASPECT = 0.4, 2.4
+MAX_PROXY_BYTES = 4 * 1024 * 1024
+DUPLICATE_DISTANCE = 6       # max differing bits between 64-bit dHashes
+DUPLICATE_REASON = "near-duplicate of an earlier candidate"
+
+PROBE_OPTS = {
+    'quiet': True,
+    'skip_download': True,
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                      'AppleWebKit/537.36 (KHTML, like Gecko) '
+                      'Chrome/122.0.0.0 Safari/537.36',
+        'Referer': 'https://www.reddit.com/'
+    },
+    'extractor_args': {'reddit': {'skip_auth': True}}
+}
+if os.path.exists('cookies.txt'):
+    PROBE_OPTS['cookiefile'] = 'cookies.txt'
+
+screen_cache = JsonCache('prescreen.json', ttl=SCREEN_TTL, max_entries=5000)
+
+def screen_post(post, seen_hashes=(), check_watermark=True):
+    """
+    Screen a Reddit post before downloading it.
+
+    Returns a dict with 'passed' (bool), 'reason', 'hash' (hex dHash of the
+    proxy image, or None), 'watermark_checked' (True when the watermark
+    check already ran on a low-res rendition) and the metadata it used.
+    The content checks are cached per post id; the near-duplicate check
+    against `seen_hashes` depends on the current run and is never cached.
+    """
+    cached = screen_cache.get(post.id)
+    if cached is not None and cached['reason'] == DUPLICATE_REASON:
+        cached = None  # written by older versions that cached the run-local dup check
+    if cached is not None:
+        print(f"🗂️ Screening cached: {cached['reason']}")
+        if cached['passed'] and _near_duplicate(cached.get('hash'), seen_hashes):
+            return dict(cached, passed=False, duplicate=True, reason=DUPLICATE_REASON)
+        return cached
+
+    try:
+        result = _screen(post, seen_hashes, check_watermark)
+    except Exception as e:
+        # Screening is an optimisation; never block a post on its own errors
+        print(f"⚠️ Screening failed, falling back to full download: {e}")
+        return {'passed': True, 'reason': 'screening error', 'hash': None, 'watermark_checked': False}
+
+    if not result.get('duplicate'):
+        screen_cache.set(post.id, result)
+        screen_cache.save()
+    return result
+
+def _near_duplicate(hash_hex, seen_hashes):
+    """True if the preview hash is close to one already taken this run"""
+    if not hash_hex:
+        return False
+    image_hash = int(hash_hex, 16)
+    return any(hamming(image_hash, int(other, 16)) <= DUPLICATE_DISTANCE for other in seen_hashes)
+
+def _screen(post, seen_hashes, check_watermark):
+    result = {'passed': False, 'reason': '', 'hash': None, 'watermark_checked': False}
+    meta = _reddit_video_meta(post)
+    info = None
+    if not meta:
+        info = _probe_formats(post.url)
+        meta = _ydl_meta(info) if info else {}
+    result.update(meta)
+
+    # 1) Duration / aspect / quality from metadata alone
+    duration = meta.get('duration') or 0
+    if duration and not (MIN_DURATION <= duration <= MAX_DURATION):
+        result['reason'] = f"duration {duration}s out of range"
+        return result
+    width, height = meta.get('width') or 0, meta.get('height') or 0
+    if width and height:
+        if max(width, height) < MIN_LONG_SIDE:
+            result['reason'] = f"resolution too low ({width}x{height})"
+            return result
+        if not (MIN_ASPECT <= width / height <= MAX_ASPECT):
+            result['reason'] = f"aspect ratio {width / height:.2f} unusable"
+            return result
+
+    # 2) Near-duplicate check on the preview image / thumbnail (before the
+    #    watermark proxy download; such results are not cached)
+    image = _fetch_image(_preview_url(post))
+    if image is not None:
+        result['hash'] = f"{dhash(image):016x}"
+        if _near_duplicate(result['hash'], seen_hashes):
+            result['reason'] = DUPLICATE_REASON
+            result['duplicate'] = True
+            return result
+
+    # 3) Watermark check on the lowest rendition, else on the still image
+    if check_watermark:
+        if info is None:
+            info = _probe_formats(post.url)
+        proxy = _download_lowest_rendition(info, post.id) if info else None
+        if proxy:
+            try:
+                overlay = detect_static_overlay(proxy)
+            finally:
+                os.remove(proxy)
+            result['watermark_checked'] = True
+            if overlay:
+                result['reason'] = f"static overlay at {overlay['region']} (low-res rendition)"
+                return result
+        elif image is not None and _check_frame_for_tiktok_watermark(image, min(image.shape[:2]) / 1080):
+            result['reason'] = "TikTok watermark in preview image"
+            return result
+
+    result['passed'] = True
+    result['reason'] = "passed screening"
+    return result
+
+# ------------------ Proxies ------------------
+def _reddit_video_meta(post):
+    """Width/height/duration straight from the Reddit listing, if hosted on v.redd.it"""
+    media = getattr(post, 'secure_media', None) or getattr(post, 'media', None)
+    if not media and getattr(post, 'crosspost_parent_list', None):
+        parent = post.crosspost_parent_list[0]
+        media = parent.get('secure_media') or parent.get('media')
+    video = (media or {}).get('reddit_video')
+    if not video:
+        return {}
+    return {
+        'width': video.get('width', 0),
+        'height': video.get('height', 0),
+        'duration': video.get('duration', 0)
+    }
+
+def _preview_url(post):
+    """Pick a ~640px Reddit preview image, falling back to the thumbnail"""
+    try:
+        image = post.preview['images'][0]
+        candidates = image.get('resolutions', []) + [image['source']]
+        best = min(candidates, key=lambda c: abs(c.get('width', 0) - 640))
+        return html.unescape(best['url'])
+    except (AttributeError, KeyError, IndexError, TypeError):
+        pass
+    thumb = getattr(post, 'thumbnail', '')
+    return thumb if thumb.startswith('http') else None
+
+def _fetch_image(url):
+    if not url:
+        return None
+    try:
+        resp = requests.get(url, timeout=10, headers={'User-Agent': PROBE_OPTS['http_headers']['User-Agent']})
+        resp.raise_for_status()
+        return cv2.imdecode(np.frombuffer(resp.content, dtype=np.uint8), cv2.IMREAD_COLOR)
+    except Exception as e:
+        print(f"⚠️ Could not fetch preview image: {e}")
+        return None
+
+def _probe_formats(url):
+    try:
+        with yt_dlp.YoutubeDL(PROBE_OPTS) as ydl:
+            return ydl.extract_info(url, download=False)
+    except Exception as e:
+        print(f"⚠️ Could not probe formats for {url}: {e}")
+        return None
+
+def _ydl_meta(info):
+    return {
+        'width': info.get('width') or 0,
+        'height': info.get('height') or 0,
+        'duration': info.get('duration') or 0
+    }
+
+def _download_lowest_rendition(info, post_id):
+    """Fetch the smallest progressive video rendition (capped at MAX_PROXY_BYTES)"""
+    formats = [
+        f for f in info.get('formats', [])
+        if f.get('vcodec') != 'none' and f.get('url')
+        and f.get('protocol', 'https') in ('http', 'https')
+        and (f.get('height') or 0) >= 144
+    ]
+    if not formats:
+        return None
+    fmt = min(formats, key=lambda f: (f.get('filesize') or f.get('filesize_approx')
+                                      or (f.get('tbr') or 0) * 1000 or f.get('height') or 0))
+
+    path = cache_path(f"proxy_{post_id}.{fmt.get('ext', 'mp4')}")
+    try:
+        with requests.get(fmt['url'], headers=fmt.get('http_headers'), stream=True, timeout=15) as resp:
+            resp.raise_for_status()
+            size = 0
+            with open(path, 'wb') as f:
+                for chunk in resp.iter_content(256 * 1024):
+                    size += len(chunk)
+                    if size > MAX_PROXY_BYTES:
+                        raise ValueError(f"rendition larger than {MAX_PROXY_BYTES // (1024 * 1024)}MB")
+                    f.write(chunk)
+        print(f"📉 Fetched {fmt.get('height')}p proxy rendition ({size / 1024:.0f} KB)")
+        return path
+    except Exception as e:
+        print(f"⚠️ Could not fetch low-res rendition: {e}")
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+
+# ------------------ Perceptual Hash ------------------
+def dhash(image):
+    """64-bit difference hash of a BGR or grayscale image"""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
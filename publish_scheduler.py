@@ -0,0 +1,71 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from cache_store import JsonCache
+
+# ------------------ YouTube Publish Scheduler ------------------
+# A videos.insert costs about INSERT_COST quota units out of a channel's
+# daily allowance, which resets at midnight Pacific time. Units spent are
+# tracked per channel and day, so a run only starts the uploads it can
+# finish and leaves the rest of the backlog (highest priority, then oldest
+# first) for the next day. A ledger keyed by Drive file id + md5 remembers
+# every file that was published, so a file whose Drive delete failed is
+# never inserted a second time.
+INSERT_COST = 1600
+DAILY_QUOTA = 10000
+QUOTA_TZ = ZoneInfo('America/Los_Angeles')
+
+quota_usage = JsonCache('youtube_quota.json', ttl=3 * 24 * 3600)
+ledger = JsonCache('youtube_ledger.json')
+
+# ---- quota ----
+def quota_day():
+    return datetime.now(QUOTA_TZ).date().isoformat()
+
+def units_used(channel):
+    return quota_usage.get(f"{channel}:{quota_day()}", 0)
+
+def charge(channel, units=INSERT_COST):
+    """Record units spent; saved at once so a killed run still counts them"""
+    key = f"{channel}:{quota_day()}"
+    quota_usage.set(key, quota_usage.get(key, 0) + units)
+    quota_usage.save()
+
+def mark_exhausted(channel, daily_quota=DAILY_QUOTA):
+    """YouTube says the quota is gone (other clients may share it); stop for today"""
+    quota_usage.set(f"{channel}:{quota_day()}", daily_quota)
+    quota_usage.save()
+
+def inserts_left(channel, daily_quota=DAILY_QUOTA):
+    return max(0, daily_quota - units_used(channel)) // INSERT_COST
+
+# ---- ledger ----
+def ledger_key(file):
+    return f"{file['id']}:{file.get('md5Checksum', '')}"
+
+def published(file):
+    """The ledger entry if this exact file was already inserted, else None"""
+    return ledger.get(ledger_key(file))
+
+def record_published(file, channel, video_id):
+    ledger.set(ledger_key(file), {'video_id': video_id, 'channel': channel, 'name': file['name']})
+    ledger.save()
+
+# ---- planning ----
+def priority(file):
+    # Optional Drive appProperties.priority; higher goes first
+    try:
+        return int((file.get('appProperties') or {}).get('priority', 0))
+    except ValueError:
+        return 0
+
+def plan(channel, files, daily_quota=DAILY_QUOTA):
+    """
+    Split a backlog into (done, batch, deferred): files the ledger says were
+    already published (they only need deleting), the files to insert this
+    run in priority/age order, and the ones left for a later day.
+    """
+    done = [f for f in files if published(f)]
+    todo = sorted((f for f in files if not published(f)),
+                  key=lambda f: (-priority(f), f.get('createdTime', '')))
+    budget = inserts_left(channel, daily_quota)
+    return done, todo[:budget], todo[budget:]
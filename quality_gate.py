@@ -0,0 +1,197 @@
+import os
+import subprocess
+import threading
+import numpy as np
+from video_sampling import probe_video
+
+# ------------------ Content Quality Gate ------------------
+# One ffmpeg pass decodes a tiny grayscale copy of the clip (fps=4, 64px wide)
+# on stdout and a mono 8kHz PCM track on a second pipe. Mean luma, frame-diff
+# energy, letterboxing and audio RMS are then computed with NumPy so black
+# intros, frozen slideshows, silent clips and tiny screen recordings are
+# rejected (or trimmed) before the expensive 1080x1920 encode.
+ANALYSIS_FPS = 4
+ANALYSIS_WIDTH = 64
+AUDIO_RATE = 8000
+AUDIO_WINDOW = 0.5        # seconds per RMS window
+BORDER_LUMA = 32          # rows/cols never brighter than this are letterbox bars
+
+PROFILES = {
+    'nba': {
+        'black_luma': 16,       # mean luma below this counts as a black frame
+        'frozen_diff': 0.25,    # mean abs frame difference below this counts as frozen
+        'max_frozen_ratio': 0.6,
+        'min_audio_db': -40.0,  # commentary/crowd should always be audible
+        'min_active_area': 0.35,
+        'min_active_side': 360,
+        'min_seconds': 10
+    },
+    'nfl': {
+        'black_luma': 16,
+        'frozen_diff': 0.25,
+        'max_frozen_ratio': 0.6,
+        'min_audio_db': -40.0,
+        'min_active_area': 0.35,
+        'min_active_side': 360,
+        'min_seconds': 10
+    },
+    'dogs': {
+        'black_luma': 16,
+        'frozen_diff': 0.2,
+        'max_frozen_ratio': 0.75,  # pet clips are often a static shot of a sleeping dog
+        'min_audio_db': -50.0,     # and often have no commentary at all
+        'min_active_area': 0.3,
+        'min_active_side': 320,
+        'min_seconds': 10
+    }
+}
+
+def check_clip_quality(video_path, profile='nba'):
+    """
+    Analyze a downloaded clip and decide whether it is worth encoding.
+
+    Returns a dict with 'passed' (bool), 'reason', 'trim' ((start, end) in
+    seconds when black lead-in/lead-out should be cut, else None) and the
+    raw 'metrics'. Analysis errors never reject a clip.
+    """
+    limits = PROFILES[profile]
+    try:
+        metrics = analyze_clip(video_path, black_luma=limits['black_luma'], frozen_diff=limits['frozen_diff'])
+    except Exception as e:
+        print(f"⚠️ Quality analysis failed, continuing without it: {e}")
+        return {'passed': True, 'reason': 'analysis error', 'trim': None, 'metrics': {}}
+    if not metrics:
+        return {'passed': True, 'reason': 'analysis unavailable', 'trim': None, 'metrics': {}}
+
+    report = {'passed': False, 'reason': '', 'trim': None, 'metrics': metrics}
+    start, end = metrics['content_start'], metrics['content_end']
+
+    if end - start <= 0:
+        report['reason'] = "clip is entirely black"
+    elif end - start < limits['min_seconds']:
+        report['reason'] = f"only {end - start:.1f}s of non-black content"
+    elif metrics['frozen_ratio'] > limits['max_frozen_ratio']:
+        report['reason'] = f"frozen for {metrics['frozen_ratio']:.0%} of the clip"
+    elif metrics['audio_db'] is not None and metrics['audio_db'] < limits['min_audio_db']:
+        report['reason'] = f"near-silent audio ({metrics['audio_db']:.1f} dBFS)"
+    elif metrics['active_area'] < limits['min_active_area']:
+        report['reason'] = f"letterboxed to {metrics['active_area']:.0%} of the frame"
+    elif metrics['active_side'] < limits['min_active_side']:
+        report['reason'] = f"picture area too small ({metrics['active_side']}px)"
+    else:
+        report['passed'] = True
+        report['reason'] = "passed quality gate"
+        if start > 0 or end < metrics['duration']:
+            report['trim'] = (start, end)
+    return report
+
+def trim_args(trim):
+    """ffmpeg input options that cut the clip to a (start, end) trim window"""
+    if not trim:
+        return []
+    start, end = trim
+    return ['-ss', f"{start:.3f}", '-t', f"{end - start:.3f}"]
+
+def analyze_clip(video_path, black_luma=16, frozen_diff=0.25):
+    """Single-pass low-res video + low-rate PCM analysis. Returns a metrics dict or None."""
+    info = probe_video(video_path)
+    if not info or not info['width'] or not info['height']:
+        return None
+
+    out_w = ANALYSIS_WIDTH
+    out_h = max(2, int(info['height'] * out_w / info['width']) // 2 * 2)
+    has_audio = _has_audio(video_path)
+
+    cmd = [
+        'ffmpeg', '-v', 'error', '-nostdin', '-i', video_path,
+        '-map', '0:v:0', '-vf', f"fps={ANALYSIS_FPS},scale={out_w}:{out_h}:flags=area",
+        '-f', 'rawvideo', '-pix_fmt', 'gray', 'pipe:1'
+    ]
+    audio_read, audio_write = None, None
+    if has_audio:
+        audio_read, audio_write = os.pipe()
+        cmd += ['-map', '0:a:0', '-ac', '1', '-ar', str(AUDIO_RATE),
+                '-f', 's16le', f"pipe:{audio_write}"]
+
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            pass_fds=(audio_write,) if has_audio else ())
+    audio_bytes = []
+    reader = None
+    if has_audio:
+        os.close(audio_write)
+        # Drain the audio pipe concurrently so neither output blocks ffmpeg
+        def _drain():
+            with os.fdopen(audio_read, 'rb') as f:
+                audio_bytes.append(f.read())
+        reader = threading.Thread(target=_drain, daemon=True)
+        reader.start()
+
+    video_bytes = proc.stdout.read()
+    proc.stdout.close()
+    proc.wait()
+    if reader:
+        reader.join()
+
+    frame_size = out_w * out_h
+    n = len(video_bytes) // frame_size
+    if n < 2:
+        return None
+    frames = np.frombuffer(video_bytes[:n * frame_size], dtype=np.uint8).reshape(n, out_h, out_w)
+
+    luma = frames.reshape(n, -1).mean(axis=1)
+    diff = np.abs(np.diff(frames.astype(np.int16), axis=0)).reshape(n - 1, -1).mean(axis=1)
+
+    # Black lead-in / lead-out, in seconds
+    content = np.flatnonzero(luma >= black_luma)
+    duration = n / ANALYSIS_FPS
+    if content.size:
+        content_start = content[0] / ANALYSIS_FPS
+        content_end = (content[-1] + 1) / ANALYSIS_FPS
+    else:
+        content_start = content_end = 0.0
+
+    # Share of the (non-black) content where consecutive frames barely differ
+    first, last = int(content_start * ANALYSIS_FPS), int(content_end * ANALYSIS_FPS)
+    content_diff = diff[first:max(first, last - 1)]
+    frozen_ratio = float(np.mean(content_diff < frozen_diff)) if content_diff.size else 1.0
+
+    # Rows/columns that never light up are letterbox/pillarbox bars
+    active_rows = np.count_nonzero(frames.max(axis=(0, 2)) > BORDER_LUMA)
+    active_cols = np.count_nonzero(frames.max(axis=(0, 1)) > BORDER_LUMA)
+    active_area = (active_rows / out_h) * (active_cols / out_w)
+    active_side = int(min(active_rows / out_h * info['height'], active_cols / out_w * info['width']))
+
+    audio_db = None
+    if audio_bytes and audio_bytes[0]:
+        samples = np.frombuffer(audio_bytes[0][:len(audio_bytes[0]) // 2 * 2], dtype=np.int16)
+        audio_db = _rms_db(samples.astype(np.float32) / 32768.0)
+
+    return {
+        'duration': duration,
+        'content_start': content_start,
+        'content_end': content_end,
+        'mean_luma': float(luma.mean()),
+        'frozen_ratio': frozen_ratio,
+        'active_area': float(active_area),
+        'active_side': active_side,
+        'audio_db': audio_db
+    }
+
+def _rms_db(samples):
+    """Loudness in dBFS: median of windowed RMS so a single bang doesn't pass a silent clip"""
+    window = int(AUDIO_RATE * AUDIO_WINDOW)
+    count = len(samples) // window
+    if count == 0:
+        rms = np.sqrt(np.mean(samples ** 2)) if len(samples) else 0.0
+    else:
+        windows = samples[:count * window].reshape(count, window)
+        rms = np.median(np.sqrt(np.mean(windows ** 2, axis=1)))
+    return float(20 * np.log10(rms + 1e-9))
+
+def _has_audio(video_path):
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'a',
+         '-show_entries', 'stream=codec_type', '-of', 'csv=p=0', video_path],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    return 'audio' in result.stdout
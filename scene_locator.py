@@ -0,0 +1,122 @@
+import re
+import json
+import math
+
+# ------------------ Transcript Scene Locator ------------------
+# Long uploads (full movies, "best scenes" compilations) are located by their
+# subtitle / auto-caption track instead of being downloaded whole. The timed
+# cues are indexed word -> cue ids, the scene description is matched against
+# a sliding window of cues, and only that window (plus padding) is downloaded.
+SUB_LANGS = ('en', 'en-US', 'en-GB', 'en-orig')
+SUB_FORMATS = ('json3', 'vtt')
+WINDOW_SECONDS = 90
+PADDING_SECONDS = 10
+MIN_MATCHED_TERMS = 2
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'his', 'her',
+    'in', 'is', 'it', 'its', 'of', 'on', 'or', 'scene', 'the', 'their', 'to', 'with'
+}
+
+def tokenize(text):
+    return [w for w in re.findall(r"[a-z0-9']+", (text or '').lower()) if w not in STOPWORDS]
+
+# ------------------ Subtitle Tracks ------------------
+def pick_subtitle_track(info):
+    """Return (url, ext) of the best English subtitle track, manual before automatic"""
+    for tracks in (info.get('subtitles') or {}, info.get('automatic_captions') or {}):
+        for lang in SUB_LANGS:
+            formats = {f.get('ext'): f.get('url') for f in tracks.get(lang) or []}
+            for ext in SUB_FORMATS:
+                if formats.get(ext):
+                    return formats[ext], ext
+    return None, None
+
+def parse_json3(data):
+    cues = []
+    for event in json.loads(data).get('events') or []:
+        text = ''.join(seg.get('utf8', '') for seg in event.get('segs') or []).strip()
+        if text:
+            start = event.get('tStartMs', 0) / 1000
+            cues.append((start, start + event.get('dDurationMs', 0) / 1000, text))
+    return cues
+
+_VTT_TIME = re.compile(r"(\d+):(\d{2}):(\d{2})\.(\d{3})\s+-->\s+(\d+):(\d{2}):(\d{2})\.(\d{3})")
+
+def parse_vtt(data):
+    cues = []
+    for block in re.split(r"\n\s*\n", data):
+        lines = block.strip().splitlines()
+        for i, line in enumerate(lines):
+            match = _VTT_TIME.search(line)
+            if match:
+                h1, m1, s1, ms1, h2, m2, s2, ms2 = map(int, match.groups())
+                # Auto-captions carry inline <timestamp><c> tags
+                text = re.sub(r"<[^>]+>", "", " ".join(lines[i + 1:])).strip()
+                if text:
+                    cues.append((h1 * 3600 + m1 * 60 + s1 + ms1 / 1000,
+                                 h2 * 3600 + m2 * 60 + s2 + ms2 / 1000, text))
+                break
+    return cues
+
+# ------------------ Inverted Index ------------------
+class CueIndex:
+    """In-memory inverted index over timed subtitle cues"""
+
+    def __init__(self, cues):
+        self.cues = sorted(cues)
+        self.postings = {}
+        for i, (_, _, text) in enumerate(self.cues):
+            for word in set(tokenize(text)):
+                self.postings.setdefault(word, []).append(i)
+
+    def idf(self, word):
+        return math.log(1 + len(self.cues) / (1 + len(self.postings.get(word, ()))))
+
+    def best_window(self, query, window=WINDOW_SECONDS):
+        """Return (start, end, matched_terms) of the window covering most query terms"""
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t in self.postings]
+        if not terms:
+            return None
+        hits = sorted((self.cues[i][0], term) for term in terms for i in self.postings[term])
+
+        best = None
+        left = 0
+        counts = {}
+        # Two-pointer sweep over hit times, scoring distinct terms by idf
+        for time_r, term_r in hits:
+            counts[term_r] = counts.get(term_r, 0) + 1
+            while hits[left][0] < time_r - window:
+                term_l = hits[left][1]
+                counts[term_l] -= 1
+                if not counts[term_l]:
+                    del counts[term_l]
+                left += 1
+            score = sum(self.idf(t) for t in counts)
+            if best is None or score > best[0]:
+                best = (score, hits[left][0], time_r, len(counts))
+        _, start, end, matched = best
+        return start, end, matched
+
+def locate_scene(info, description, fetch):
+    """
+    Find the time window of a scene inside a long video from its subtitles.
+    `fetch(url)` returns the track text. Returns (start, end) in seconds,
+    padded and clamped to the video, or None if the transcript doesn't match.
+    """
+    url, ext = pick_subtitle_track(info)
+    if not url:
+        return None
+    data = fetch(url)
+    cues = parse_json3(data) if ext == 'json3' else parse_vtt(data)
+    if not cues:
+        return None
+    found = CueIndex(cues).best_window(description)
+    needed = min(MIN_MATCHED_TERMS, len(set(tokenize(description))))
+    if not found or found[2] < needed:
+        return None
+    start, end, _ = found
+    # Centre short matches in a full-length window so the clip has context
+    slack = max(0, WINDOW_SECONDS - (end - start)) / 2
+    duration = info.get('duration') or end + WINDOW_SECONDS
+    return max(0, start - slack - PADDING_SECONDS), min(duration, end + slack + PADDING_SECONDS)
@@ -1,32 +1,60 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import os
 import json
+import atexit
+import threading
+from cache_store import cache_path
+from google_clients import gspread_client
 
 # --- Google Sheets Configuration ---
 SHEET_ID = '1NrMfQsP4IOkpoGiulGmFdu_lC9fhgiJuB3a0oKrbqJE'
 SHEET_NAME = 'Sheet1'
 
+# --- Write-behind journal ---
+# Rows are appended to a local JSON-lines journal instead of going to Sheets
+# one API call at a time. flush_sheet_rows() sends everything pending with one
+# append_rows call per worksheet and only then drops those rows from the
+# journal, so rows from a run whose flush failed are sent by the next run.
+JOURNAL_PATH = cache_path('sheets_journal.jsonl')
+_journal_lock = threading.Lock()
+
 def get_google_sheets_client():
     """
     Authenticates with Google Sheets API using service account credentials.
+    The client is authorized once per process and reused for every row.
     """
     try:
         # Get credentials from GitHub Secrets
-        creds_json_str = os.environ['GOOGLE_SHEETS_CREDENTIALS']
-        creds_json = json.loads(creds_json_str)
-        
         scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_json, scope)
-        client = gspread.authorize(creds)
-        return client
+        return gspread_client(scope, 'GOOGLE_SHEETS_CREDENTIALS')
     except Exception as e:
         print(f"Error authenticating with Google Sheets: {e}")
         return None
 
+def _read_journal():
+    try:
+        with open(JOURNAL_PATH, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+    except OSError:
+        return []
+    entries = []
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue  # torn last line from a killed run
+    return entries
+
+def _write_journal(entries):
+    tmp = f"{JOURNAL_PATH}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    os.replace(tmp, JOURNAL_PATH)
+
 def add_video_to_sheet(source, reddit_url, reddit_caption, drive_video_name):
     """
-    Adds a new row to the specified Google Sheet with video details.
+    Queues a new row for the Google Sheet with video details. The row is
+    written to the local journal immediately and sent on the next flush.
 
     Args:
         source (str): The source of the video ('NBA' or 'NFL').
@@ -34,18 +62,50 @@ def add_video_to_sheet(source, reddit_url, reddit_caption, drive_video_name):
         reddit_caption (str): The caption of the video on Reddit.
         drive_video_name (str): The name of the video file in Google Drive.
     """
-    client = get_google_sheets_client()
-    if client:
-        try:
-            sheet = client.open_by_key(SHEET_ID).worksheet(SHEET_NAME)
-            
-            # Prepare the row data in the correct order
-            row_data = [source, reddit_url, reddit_caption, drive_video_name]
-            
-            sheet.append_row(row_data)
-            print(f"Successfully added video data to Google Sheet: {row_data}")
-        except Exception as e:
-            print(f"Error adding data to Google Sheet: {e}")
+    # Prepare the row data in the correct order
+    row_data = [source, reddit_url, reddit_caption, drive_video_name]
+    entry = {'sheet': SHEET_ID, 'tab': SHEET_NAME, 'row': row_data}
+    with _journal_lock:
+        with open(JOURNAL_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    print(f"📝 Queued video data for Google Sheet: {row_data}")
+
+def flush_sheet_rows():
+    """
+    Send every journaled row (including ones left over from earlier runs)
+    with one append_rows call per worksheet. Returns the number of rows sent;
+    rows that could not be sent stay in the journal.
+    """
+    with _journal_lock:
+        entries = _read_journal()
+        if not entries:
+            return 0
+        groups = {}
+        for entry in entries:
+            groups.setdefault((entry['sheet'], entry['tab']), []).append(entry)
+
+        client = get_google_sheets_client()
+        sent = 0
+        pending = []
+        for (sheet_id, tab), group in groups.items():
+            try:
+                if client is None:
+                    raise RuntimeError("no Sheets client")
+                sheet = client.open_by_key(sheet_id).worksheet(tab)
+                sheet.append_rows([e['row'] for e in group])
+                sent += len(group)
+            except Exception as e:
+                print(f"Error adding data to Google Sheet {tab}: {e} ({len(group)} rows kept for the next run)")
+                pending.extend(group)
+        _write_journal(pending)
+    if sent:
+        print(f"Successfully added {sent} rows to Google Sheet.")
+    return sent
+
+# Whatever a run did not flush explicitly still goes out at exit
+atexit.register(flush_sheet_rows)
 
 if __name__ == '__main__':
     # Example usage for testing
@@ -58,3 +118,4 @@ if __name__ == '__main__':
         "This is a test caption.",
         "Test Video Name.mp4"
     )
+    flush_sheet_rows()
@@ -0,0 +1,36 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+requests = pytest.importorskip('requests')
+llm_client = pytest.importorskip('llm_client')
+
+DELTAS = ['LeBron slams it ', '🔥🏀', ' – café']
+
+class _SSEHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        self.wfile.write(b': OPENROUTER PROCESSING\n\n')
+        for delta in DELTAS:
+            event = {'choices': [{'delta': {'content': delta}}]}
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+        self.wfile.write(b'data: [DONE]\n\n')
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def sse_url():
+    server = HTTPServer(('127.0.0.1', 0), _SSEHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+
+def test_stream_deltas_decodes_utf8_without_charset(sse_url):
+    with requests.get(sse_url, stream=True, timeout=5) as response:
+        assert ''.join(llm_client._stream_deltas(response)) == ''.join(DELTAS)
@@ -3,16 +3,15 @@
 import os
 import sys
 import subprocess
-import json
 import re
 import requests
 import shutil
 from pathlib import Path
 
 import yt_dlp
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from google_clients import get_drive_service
+from drive_uploader import upload_many
+from drive_index import get_drive_index
 
 # ── CONFIGURATION ───────────────────────────────────────────────────────────
 SCOPES = ['https://www.googleapis.com/auth/drive']
@@ -26,49 +25,22 @@ def sanitize_filename(fn):
 
 def authenticate_drive():
     """Authenticate with Google Drive using service account"""
-    SERVICE_ACCOUNT_INFO = json.loads(os.environ['GDRIVE_SERVICE_ACCOUNT'])
-    creds = service_account.Credentials.from_service_account_info(
-        SERVICE_ACCOUNT_INFO, scopes=SCOPES
-    )
-    return build('drive', 'v3', credentials=creds)
+    return get_drive_service(SCOPES)
 
 def get_or_create_subfolder(drive_service, parent_folder_id, subfolder_name):
     """Get or create a subfolder within a specific parent folder."""
-    # Check if folder already exists
-    q = f"name='{subfolder_name}' and '{parent_folder_id}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
-    res = drive_service.files().list(q=q, fields="files(id)", pageSize=1).execute()
-    items = res.get('files', [])
-    
-    if items:
-        folder_id = items[0]['id']
-        print(f"📁 Found existing subfolder '{subfolder_name}' (ID: {folder_id})")
-        return folder_id
+    index = get_drive_index(drive_service)
+    existing = index.find(subfolder_name, parent_folder_id, folder=True)
+    if existing:
+        print(f"📁 Found existing subfolder '{subfolder_name}' (ID: {existing['id']})")
+        return existing['id']
     
     # If not, create it
     print(f"📁 Creating new subfolder '{subfolder_name}'...")
-    folder_metadata = {
-        'name': subfolder_name,
-        'parents': [parent_folder_id],
-        'mimeType': 'application/vnd.google-apps.folder'
-    }
-    folder = drive_service.files().create(
-        body=folder_metadata,
-        fields='id'
-    ).execute()
-    folder_id = folder.get('id')
+    folder_id = index.get_or_create_folder(subfolder_name, parent_folder_id)
     print(f"✅ Created subfolder with ID: {folder_id}")
     return folder_id
 
-def upload_to_drive(drive_service, folder_id, file_path):
-    """Upload file to Google Drive folder"""
-    name = os.path.basename(file_path)
-    media = MediaFileUpload(file_path)
-    drive_service.files().create(
-        body={'name': name, 'parents': [folder_id]},
-        media_body=media
-    ).execute()
-    print(f"✅ Uploaded {name} to Google Drive")
-
 def download_twitter_video(url, work_dir, cookie_file=None):
     """Download Twitter/X video with robust error handling"""
     work_dir.mkdir(parents=True, exist_ok=True)
@@ -311,7 +283,7 @@ def main(twitter_url, num_clips, drive_folder_name, cookie_file=None, crop_style
         # Create a subfolder within the main "Custom Clips" folder
         subfolder_id = get_or_create_subfolder(drive_service, PARENT_DRIVE_FOLDER_ID, drive_folder_name)
         
-        uploaded_count = 0
+        final_paths = []
         for i, clip_file in enumerate(clip_files, 1):
             # Use original tweet content for the filename
             safe_title = sanitize_filename(title)
@@ -320,14 +292,16 @@ def main(twitter_url, num_clips, drive_folder_name, cookie_file=None, crop_style
             
             # Rename file before upload
             clip_file.rename(final_path)
-            
-            try:
-                # Upload to the newly created subfolder
-                upload_to_drive(drive_service, subfolder_id, final_path)
+            final_paths.append(str(final_path))
+        
+        # Upload all clips to the subfolder concurrently; results come back in clip order
+        uploaded_count = 0
+        for i, (final_path, file_id, error) in enumerate(upload_many(drive_service, final_paths, subfolder_id), 1):
+            if file_id:
                 uploaded_count += 1
-                print(f"📤 Uploaded: {final_name}")
-            except Exception as e:
-                print(f"❌ Upload failed for clip {i}: {e}")
+                print(f"📤 Uploaded: {os.path.basename(final_path)}")
+            else:
+                print(f"❌ Upload failed for clip {i}: {error}")
         
         print(f"\n🎉 Success! Uploaded {uploaded_count}/{len(clip_files)} clips to subfolder '{drive_folder_name}'")
         return True
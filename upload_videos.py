@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from google.auth.transport.requests import AuthorizedSession
+from google_clients import service_account_credentials, user_credentials, get_drive_service
+from youtube_relay import relay_to_youtube, QuotaExceeded
+from publish_scheduler import DAILY_QUOTA, plan, charge, mark_exhausted, published, record_published
+
+# ── Channel table ──────────────────────────────────────────────────────────────
+# One uploader drains every channel's Drive folder into its YouTube channel.
+# Channels run concurrently, each with its own YouTube session and queue;
+# Drive is listed once for all folders and shared through per-thread sessions.
+# delete_with: 'service' deletes with the Drive service account, 'user' with
+# the channel's own OAuth token (which then needs the drive scope).
+# daily_quota (optional) overrides the default YouTube units per day; inserts
+# are budgeted against it by publish_scheduler.
+YOUTUBE_SCOPE = "https://www.googleapis.com/auth/youtube.upload"
+DRIVE_SCOPE = "https://www.googleapis.com/auth/drive"
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files/{file_id}"
+
+CHANNELS = {
+    'dogs': {
+        'token_env': 'VIRALPUPS_YT_TOKEN',
+        'folder_id': '12xiVWGcrWXnMGha2L4EegCR5jPUxhYr6',
+        'description': 'Enjoy! #ViralPups #Dogs #Shorts',
+        'tags': ['ViralPups', 'Dogs', 'Shorts'],
+        'delete_with': 'service'
+    },
+    'funny': {
+        'token_env': 'FUNNY_YT_TOKEN',
+        'folder_id': '1wQjIVp5PCKIGhRYTrIXO5fzcWH4tMFXy',
+        'description': 'Enjoy! #Funny #Shorts',
+        'tags': ['Funny', 'Shorts'],
+        'delete_with': 'service'
+    },
+    'impulse': {
+        'token_env': 'IMPULSE_YT_TOKEN',
+        'folder_id': '1IjWmMJJKp3BMhVINrSbwkL1HIT5277WF',
+        'description': 'Enjoy! #Impulse #Shorts',
+        'tags': ['Impulse', 'Shorts'],
+        'delete_with': 'service'
+    },
+    'cats': {
+        'token_env': 'CATS_YT_TOKEN',
+        'folder_id': '15CwudXXMNqIrkw21PWYErNtsU2asuL5A',
+        'description': 'Enjoy! #Cats #Shorts',
+        'tags': ['Cats', 'Shorts'],
+        'delete_with': 'service'
+    },
+    'poly': {
+        'token_env': 'POLY_YT_TOKEN',
+        'folder_id': '1doZY9jhn4Zx0HZ2noWuJMSnIeNOjAATu',
+        'description': 'Enjoy! #Poly #Shorts',
+        'tags': ['Poly', 'Shorts'],
+        'delete_with': 'user'
+    }
+}
+
+# ── Drive: one service account, one session per thread ─────────────────────────
+_local = threading.local()
+
+def drive_session():
+    if not hasattr(_local, 'drive'):
+        _local.drive = AuthorizedSession(service_account_credentials([DRIVE_SCOPE]))
+    return _local.drive
+
+def youtube_credentials(channel):
+    scopes = [YOUTUBE_SCOPE] + ([DRIVE_SCOPE] if channel['delete_with'] == 'user' else [])
+    return user_credentials(channel['token_env'], scopes)
+
+# ── One listing pass for every channel folder ──────────────────────────────────
+def list_backlogs(channels):
+    """Return {channel_name: [file, ...]} from a single paged files.list query"""
+    by_folder = {CHANNELS[name]['folder_id']: name for name in channels}
+    backlogs = {name: [] for name in channels}
+    drive_service = get_drive_service([DRIVE_SCOPE])
+    parents = " or ".join(f"'{folder_id}' in parents" for folder_id in by_folder)
+    page_token = None
+    while True:
+        response = drive_service.files().list(
+            q=f"({parents}) and trashed=false",
+            spaces='drive',
+            fields='nextPageToken, files(id,name,size,parents,md5Checksum,createdTime,appProperties)',
+            pageSize=1000,
+            pageToken=page_token
+        ).execute()
+        for file in response.get('files', []):
+            for parent in file.get('parents', []):
+                if parent in by_folder:
+                    backlogs[by_folder[parent]].append(file)
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+    return backlogs
+
+def short_title(name):
+    # Sanitize & truncate title
+    base = os.path.splitext(name)[0]
+    if len(base) > 90:
+        base = base[:87].rstrip() + "..."
+    return f"{base} #shorts"
+
+# ── Per-channel worker ─────────────────────────────────────────────────────────
+def delete_from_drive(name, deleter, file):
+    print(f"🗑️ [{name}] Deleting {file['name']} from Drive")
+    try:
+        response = deleter.delete(DRIVE_FILES_URL.format(file_id=file['id']), timeout=30)
+        if response.status_code not in (200, 204, 404):
+            print(f"⚠️ [{name}] Could not delete {file['name']}: {response.status_code}")
+    except Exception as e:
+        print(f"⚠️ [{name}] Could not delete {file['name']}: {e}")
+
+def drain_channel(name, files):
+    """Upload (and then delete) as much of one channel's backlog as today's quota allows"""
+    channel = CHANNELS[name]
+    try:
+        creds = youtube_credentials(channel)
+    except Exception as e:
+        print(f"❌ [{name}] Could not load YouTube credentials: {e}")
+        return 0
+    youtube = AuthorizedSession(creds)
+    deleter = youtube if channel['delete_with'] == 'user' else drive_session()
+    daily_quota = channel.get('daily_quota', DAILY_QUOTA)
+
+    already, batch, deferred = plan(name, files, daily_quota)
+    for file in already:
+        # Published by an earlier run whose Drive delete failed; only retry the delete
+        print(f"⏭️ [{name}] {file['name']} is already on YouTube as {published(file)['video_id']}")
+        delete_from_drive(name, deleter, file)
+    if deferred:
+        print(f"⏳ [{name}] Quota allows {len(batch)} uploads today; {len(deferred)} deferred to a later run")
+
+    done = 0
+    for file in batch:
+        title = short_title(file['name'])
+        print(f"📤 [{name}] Uploading {file['name']} as YouTube Short with title: {title}")
+        body = {
+            'snippet': {
+                'title':       title,
+                'description': channel['description'],
+                'tags':        channel['tags']
+            },
+            'status': {'privacyStatus': 'public'}
+        }
+        try:
+            # Charged only when a new insert is requested (YouTube bills it even
+            # if the upload then fails); resumed sessions cost nothing more
+            video_id = relay_to_youtube(drive_session(), youtube, file['id'], int(file['size']), body,
+                                        on_insert=lambda: charge(name))
+        except QuotaExceeded as e:
+            mark_exhausted(name, daily_quota)
+            print(f"🛑 [{name}] {e}; stopping for today")
+            break
+        except Exception as e:
+            print(f"❌ [{name}] Upload failed for {file['name']}: {e}")
+            continue
+        record_published(file, name, video_id)
+
+        delete_from_drive(name, deleter, file)
+        done += 1
+        print(f"✅ [{name}] Completed upload and cleanup for {file['name']}")
+    return done
+
+def main(channel_names=None):
+    names = channel_names or [n for n, c in CHANNELS.items() if os.environ.get(c['token_env'])]
+    missing = [n for n in names if n not in CHANNELS or not os.environ.get(CHANNELS[n]['token_env'])]
+    if missing:
+        raise ValueError(f"Unknown channels or missing tokens: {missing}")
+    if not names:
+        print("ℹ️ No channel tokens configured.")
+        return
+
+    backlogs = list_backlogs(names)
+    for name in names:
+        print(f"📋 {name}: {len(backlogs[name])} videos queued")
+    busy = [n for n in names if backlogs[n]]
+    if not busy:
+        print("ℹ️ No videos found to upload.")
+        return
+
+    with ThreadPoolExecutor(max_workers=len(busy)) as pool:
+        results = dict(zip(busy, pool.map(lambda n: drain_channel(n, backlogs[n]), busy)))
+    for name in busy:
+        print(f"✅ {name}: uploaded {results[name]}/{len(backlogs[name])} videos")
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or None)
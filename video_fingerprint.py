@@ -0,0 +1,183 @@
+import os
+import time
+import cv2
+import numpy as np
+from cache_store import JsonCache, CACHE_DIR
+from video_sampling import probe_video, sample_frames
+
+# ------------------ Perceptual Fingerprint Index ------------------
+# The same clip arrives as a v.redd.it upload, a streamable link and a
+# crosspost, and NBA/NFL share the "Impulse" folder. Each clip is
+# fingerprinted as the pHash of a few low-res frames; fingerprints are kept
+# in a persistent index and searched by Hamming distance through a BK-tree.
+# The index is sharded by source (fingerprints/nba.json, ...): every shard is
+# read, but a pipeline only writes its own, so jobs that run at the same time
+# and restore/save their caches independently never overwrite each other.
+INDEX_DIR = 'fingerprints'
+FINGERPRINT_FRAMES = 6
+FRAME_DISTANCE = 10          # max differing bits for two frame hashes to match
+MATCH_RATIO = 0.5            # share of frames that must match an indexed clip
+INDEX_TTL = 180 * 24 * 3600
+
+# ------------------ pHash ------------------
+def phash(gray):
+    """64-bit DCT perceptual hash of a grayscale frame"""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])  # skip the DC term when picking the threshold
+    return int(np.packbits(bits).view('>u8')[0])
+
+def fingerprint_video(video_path, num_frames=FINGERPRINT_FRAMES):
+    """
+    Return a list of frame pHashes (as hex strings) spread over the clip,
+    skipping the very first frame (often a black or title card), or None.
+    """
+    info = probe_video(video_path)
+    if not info or not info['duration']:
+        return None
+    interval = max(0.5, info['duration'] / (num_frames + 1))
+    frames, _ = sample_frames(
+        video_path,
+        max_frames=num_frames + 1,
+        interval=interval,
+        max_width=128,
+        gray=True,
+        info=info
+    )
+    if frames is None or len(frames) < 2:
+        return None
+    return [f"{phash(frame):016x}" for frame in frames[1:]]
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+# ------------------ BK-tree ------------------
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes for radius searches"""
+
+    def __init__(self):
+        self.root = None  # node = [hash, items, {distance: child}]
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value, radius):
+        """Return [(distance, item), ...] for all hashes within `radius`"""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= radius:
+                found.extend((d, item) for item in node[1])
+            for dist, child in node[2].items():
+                if d - radius <= dist <= d + radius:
+                    stack.append(child)
+        return found
+
+# ------------------ Persistent Index ------------------
+class FingerprintIndex:
+    """
+    Persistent clip index: entries are stored in one JsonCache per source
+    and all shards are loaded into a BK-tree keyed by frame hash at start-up.
+    """
+
+    def __init__(self, directory=INDEX_DIR):
+        self.directory = directory
+        self.shards = {}
+        self.owner = {}
+        self.tree = BKTree()
+        path = os.path.join(CACHE_DIR, directory)
+        os.makedirs(path, exist_ok=True)
+        # Includes the pre-sharding index.json, which is now only read
+        for file_name in sorted(os.listdir(path)):
+            if file_name.endswith('.json'):
+                self._shard(file_name[:-len('.json')])
+
+    def _shard(self, name):
+        if name not in self.shards:
+            store = JsonCache(f"{self.directory}/{name}.json", ttl=INDEX_TTL, max_entries=50000)
+            self.shards[name] = store
+            for key, entry in store.items():
+                self.owner[key] = store
+                self._add_to_tree(key, entry['hashes'])
+        return self.shards[name]
+
+    def _add_to_tree(self, key, hashes):
+        for h in hashes:
+            self.tree.add(int(h, 16), key)
+
+    def find_duplicate(self, hashes):
+        """Return the indexed entry that this fingerprint duplicates, or None"""
+        if not hashes:
+            return None
+        votes = {}
+        for h in hashes:
+            matched = {key for _, key in self.tree.search(int(h, 16), FRAME_DISTANCE)}
+            for key in matched:
+                votes[key] = votes.get(key, 0) + 1
+        if not votes:
+            return None
+        key, count = max(votes.items(), key=lambda kv: kv[1])
+        if count / len(hashes) < MATCH_RATIO:
+            return None
+        entry = self.owner[key].get(key)
+        if entry is None:
+            return None
+        return dict(entry, key=key, matched_frames=count)
+
+    def register(self, hashes, source, name):
+        if not hashes:
+            return
+        store = self._shard(source.lower())
+        key = f"{source}:{hashes[0]}:{int(time.time())}"
+        store.set(key, {'hashes': hashes, 'source': source, 'name': name})
+        self.owner[key] = store
+        self._add_to_tree(key, hashes)
+        store.save()
+
+_index = None
+
+def get_index():
+    global _index
+    if _index is None:
+        _index = FingerprintIndex()
+    return _index
+
+def check_duplicate(video_path):
+    """
+    Fingerprint a clip and look it up in the shared index.
+    Returns (hashes, duplicate_entry_or_None). Errors never block a clip.
+    """
+    try:
+        hashes = fingerprint_video(video_path)
+        duplicate = get_index().find_duplicate(hashes)
+        if duplicate:
+            print(f"♻️ Duplicate of '{duplicate['name']}' from {duplicate['source']} "
+                  f"({duplicate['matched_frames']}/{len(hashes)} frames match)")
+        return hashes, duplicate
+    except Exception as e:
+        print(f"⚠️ Fingerprint check failed: {e}")
+        return None, None
+
+def register_upload(hashes, source, name):
+    """Record an uploaded clip's fingerprint so later runs can skip it"""
+    try:
+        get_index().register(hashes, source, name)
+    except Exception as e:
+        print(f"⚠️ Could not register fingerprint: {e}")
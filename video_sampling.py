@@ -0,0 +1,98 @@
+import json
+import subprocess
+import numpy as np
+
+# ------------------ Pipe-based Frame Sampler ------------------
+# One ffmpeg process decodes the clip once, keeps only the sampled frames
+# (fps filter), crops/scales them inside ffmpeg and streams raw pixels over
+# stdout. Python never sees a full-resolution frame and never seeks.
+
+def probe_video(video_path):
+    """Return width, height, duration and fps of the first video stream"""
+    try:
+        result = subprocess.run([
+            'ffprobe', '-v', 'quiet', '-print_format', 'json',
+            '-show_streams', '-show_format', '-select_streams', 'v:0', video_path
+        ], capture_output=True, text=True, check=True)
+        data = json.loads(result.stdout)
+        if not data.get('streams'):
+            return None
+        stream = data['streams'][0]
+        num, _, den = stream.get('avg_frame_rate', '0/1').partition('/')
+        fps = float(num) / float(den) if den and float(den) else 0.0
+        duration = float(stream.get('duration') or data.get('format', {}).get('duration') or 0)
+        return {
+            'width': int(stream.get('width', 0)),
+            'height': int(stream.get('height', 0)),
+            'duration': duration,
+            'fps': fps
+        }
+    except Exception as e:
+        print(f"⚠️ ffprobe failed on {video_path}: {e}")
+        return None
+
+def _even(value):
+    return max(2, int(value) // 2 * 2)
+
+def sample_frames(video_path, max_frames=5, interval=2.0, roi=None, max_width=None,
+                  gray=False, info=None):
+    """
+    Sample frames every `interval` seconds through a single ffmpeg pipe.
+
+    roi is an optional (x, y, w, h) tuple of fractions of the frame
+    (e.g. (0, 0.75, 0.4, 0.25) for the bottom-left 40%x25%). max_width
+    downscales the cropped region inside ffmpeg. Returns a uint8 array of
+    shape (N, H, W, 3) in BGR order (or (N, H, W) when gray=True) and the
+    scale factor applied to the region, or (None, 0) on failure.
+    """
+    info = info or probe_video(video_path)
+    if not info or not info['width'] or not info['height']:
+        return None, 0
+
+    x, y, w, h = roi or (0.0, 0.0, 1.0, 1.0)
+    crop_w = _even(info['width'] * w)
+    crop_h = _even(info['height'] * h)
+    crop_x = int(info['width'] * x)
+    crop_y = int(info['height'] * y)
+    crop_x = min(crop_x, info['width'] - crop_w)
+    crop_y = min(crop_y, info['height'] - crop_h)
+
+    scale = 1.0
+    if max_width and crop_w > max_width:
+        scale = max_width / crop_w
+    out_w = _even(crop_w * scale)
+    out_h = _even(crop_h * scale)
+
+    filters = [f"fps=1/{interval}"]
+    if (crop_w, crop_h) != (info['width'], info['height']):
+        filters.append(f"crop={crop_w}:{crop_h}:{crop_x}:{crop_y}")
+    if (out_w, out_h) != (crop_w, crop_h):
+        filters.append(f"scale={out_w}:{out_h}:flags=area")
+
+    channels = 1 if gray else 3
+    cmd = [
+        'ffmpeg', '-v', 'error', '-nostdin', '-i', video_path,
+        '-an', '-sn', '-dn',
+        '-vf', ','.join(filters),
+        '-frames:v', str(max_frames),
+        '-f', 'rawvideo', '-pix_fmt', 'gray' if gray else 'bgr24',
+        'pipe:1'
+    ]
+
+    frame_bytes = out_w * out_h * channels
+    frames = []
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while len(frames) < max_frames:
+            buf = proc.stdout.read(frame_bytes)
+            if len(buf) < frame_bytes:
+                break
+            frame = np.frombuffer(buf, dtype=np.uint8)
+            frames.append(frame.reshape((out_h, out_w) if gray else (out_h, out_w, 3)))
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+    if not frames:
+        return None, 0
+    return np.stack(frames), scale
@@ -0,0 +1,247 @@
+import time
+import queue
+import threading
+import requests
+from google.auth.transport.requests import AuthorizedSession
+from cache_store import JsonCache
+
+# ------------------ Drive → YouTube Streaming Relay ------------------
+# Drive media bytes are streamed straight into a YouTube resumable upload.
+# A reader thread pulls the Drive download into a bounded queue while the
+# main thread sends fixed-size chunks to YouTube, so both transfers overlap,
+# nothing touches disk and memory stays at roughly
+# BUFFER_PIECES * PIECE_SIZE + MAX_CHUNK whatever the file size.
+# Either side resumes from its own offset after a transient error. The
+# YouTube session URI is persisted per Drive file, so a run that was killed
+# mid-upload continues the same upload next time, re-reading Drive from the
+# offset YouTube already has. Chunk sizes adapt to the measured throughput and
+# every finished upload's throughput and retry counts are logged to the cache.
+DRIVE_MEDIA_URL = "https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
+YOUTUBE_UPLOAD_URL = "https://www.googleapis.com/upload/youtube/v3/videos?uploadType=resumable&part=snippet,status"
+PIECE_SIZE = 1024 * 1024
+BUFFER_PIECES = 16
+CHUNK_UNIT = 256 * 1024              # non-final chunks must be multiples of this
+INITIAL_CHUNK = 8 * 1024 * 1024
+MIN_CHUNK = 2 * 1024 * 1024
+MAX_CHUNK = 32 * 1024 * 1024
+TARGET_CHUNK_SECONDS = 4
+MAX_RETRIES = 6
+SESSION_TTL = 6 * 24 * 3600
+
+sessions = JsonCache('youtube_upload_sessions.json', ttl=SESSION_TTL)
+upload_log = JsonCache('youtube_upload_log.json', max_entries=500)
+
+class RelayError(Exception):
+    pass
+
+class SessionLost(RelayError):
+    """The upload session was rejected or expired; it cannot be resumed"""
+
+class QuotaExceeded(RelayError):
+    """The channel's daily YouTube quota or upload limit is used up"""
+
+def _backoff(attempt):
+    time.sleep(min(60, 2 ** attempt))
+
+# ------------------ Drive side ------------------
+def _permanent_drive_error(response):
+    """A 4xx other than a timeout or rate limit (Drive also rate-limits with 403)"""
+    if not 400 <= response.status_code < 500 or response.status_code in (408, 429):
+        return False
+    return not (response.status_code == 403 and 'ratelimitexceeded' in response.text.lower())
+
+def _read_drive(session, file_id, size, pieces, stop, offset, stats):
+    """Producer: stream the file from `offset` into `pieces`, reconnecting with a Range header on error"""
+    attempt = 0
+    try:
+        while offset < size and not stop.is_set():
+            try:
+                headers = {'Range': f"bytes={offset}-"} if offset else {}
+                with session.get(DRIVE_MEDIA_URL.format(file_id=file_id), headers=headers,
+                                 stream=True, timeout=60) as response:
+                    if _permanent_drive_error(response):
+                        # Deleted file, lost permission, bad range: retrying will not help
+                        raise RelayError(f"Drive refused the download: {response.status_code} {response.text[:200]}")
+                    response.raise_for_status()
+                    for piece in response.iter_content(PIECE_SIZE):
+                        if stop.is_set():
+                            return
+                        pieces.put(piece)
+                        offset += len(piece)
+                        attempt = 0
+            except requests.RequestException as e:
+                attempt += 1
+                stats['drive_retries'] += 1
+                if attempt > MAX_RETRIES:
+                    raise RelayError(f"Drive download failed at {offset} bytes: {e}")
+                print(f"⚠️ Drive stream interrupted at {offset / (1024 * 1024):.1f}MB ({e}), resuming")
+                _backoff(attempt)
+        pieces.put(None)
+    except Exception as e:
+        pieces.put(e)
+
+# ------------------ YouTube side ------------------
+def _start_upload(session, body, size):
+    response = session.post(
+        YOUTUBE_UPLOAD_URL,
+        json=body,
+        headers={'X-Upload-Content-Length': str(size), 'X-Upload-Content-Type': 'video/*'},
+        timeout=60
+    )
+    if response.status_code == 403 and ('quotaExceeded' in response.text or 'uploadLimitExceeded' in response.text):
+        raise QuotaExceeded(f"YouTube quota exhausted: {response.text[:200]}")
+    if response.status_code != 200:
+        raise RelayError(f"Could not start YouTube upload: {response.status_code} {response.text[:200]}")
+    return response.headers['Location']
+
+def _acked(response):
+    acked = response.headers.get('Range')
+    return int(acked.rsplit('-', 1)[1]) + 1 if acked else 0
+
+def _query_offset(session, upload_uri, size):
+    """
+    Ask YouTube how much of a session it has. Returns the next offset, the
+    video resource if the upload already completed, or None if the session
+    is gone.
+    """
+    try:
+        response = session.put(upload_uri, headers={'Content-Range': f"bytes */{size}"}, timeout=30)
+    except requests.RequestException:
+        return None
+    if response.status_code in (200, 201):
+        return response.json()
+    if response.status_code == 308:
+        return _acked(response)
+    return None
+
+def _next_chunk_size(chunk_bytes, seconds):
+    rate = chunk_bytes / max(seconds, 0.001)
+    size = int(rate * TARGET_CHUNK_SECONDS) // CHUNK_UNIT * CHUNK_UNIT
+    return max(MIN_CHUNK, min(MAX_CHUNK, size))
+
+def _send_chunk(session, upload_uri, chunk, start, size, stats):
+    """
+    PUT one chunk, retrying transient errors. Returns (next_offset, video)
+    where video is the final resource once the whole file is stored.
+    """
+    attempt = 0
+    while True:
+        end = start + len(chunk) - 1
+        try:
+            response = session.put(upload_uri, data=bytes(chunk),
+                                   headers={'Content-Range': f"bytes {start}-{end}/{size}"}, timeout=120)
+            if response.status_code in (200, 201):
+                return size, response.json()
+            if response.status_code == 308:
+                return _acked(response), None
+            if response.status_code < 500 and response.status_code not in (408, 429):
+                raise SessionLost(f"YouTube rejected chunk: {response.status_code} {response.text[:200]}")
+            error = response.status_code
+        except requests.RequestException as e:
+            error = e
+        attempt += 1
+        stats['youtube_retries'] += 1
+        if attempt > MAX_RETRIES:
+            raise RelayError(f"YouTube upload failed at {start} bytes: {error}")
+        print(f"⚠️ YouTube upload interrupted at {start / (1024 * 1024):.1f}MB ({error}), resuming")
+        _backoff(attempt)
+        # Ask how much actually arrived and resend only the rest of this chunk
+        status = _query_offset(session, upload_uri, size)
+        if isinstance(status, dict):
+            return size, status
+        if status is not None:
+            if status < start:
+                raise SessionLost("YouTube lost bytes that are no longer buffered")
+            del chunk[:status - start]
+            start = status
+
+def _session(auth):
+    return auth if isinstance(auth, AuthorizedSession) else AuthorizedSession(auth)
+
+def relay_to_youtube(drive_auth, youtube_auth, file_id, size, body, on_insert=None):
+    """
+    Copy a Drive file into a new YouTube video without touching disk.
+    `drive_auth`/`youtube_auth` are credentials or existing AuthorizedSessions
+    (reused for keep-alive). `body` is the videos.insert resource
+    (snippet/status). An upload left unfinished by an earlier run of the
+    same file is continued instead of restarted. `on_insert`, if given, is
+    called just before a new videos.insert session is requested (not when an
+    earlier session is resumed or found complete). Returns the video id.
+    """
+    drive = _session(drive_auth)
+    youtube = _session(youtube_auth)
+    key = f"{file_id}:{size}"
+
+    upload_uri = sessions.get(key)
+    offset = _query_offset(youtube, upload_uri, size) if upload_uri else None
+    if isinstance(offset, dict):
+        # The earlier run finished the upload but died before cleaning up
+        sessions.delete(key)
+        sessions.save()
+        return offset['id']
+    if offset is None:
+        if on_insert:
+            on_insert()
+        upload_uri = _start_upload(youtube, body, size)
+        sessions.set(key, upload_uri)
+        sessions.save()
+        offset = 0
+    else:
+        print(f"🔁 Resuming YouTube upload at {offset / (1024 * 1024):.1f}MB")
+    resumed_from = offset
+
+    stats = {'drive_retries': 0, 'youtube_retries': 0}
+    pieces = queue.Queue(maxsize=BUFFER_PIECES)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_drive, args=(drive, file_id, size, pieces, stop, offset, stats),
+                              daemon=True)
+    reader.start()
+
+    start_time = time.time()
+    chunk_size = INITIAL_CHUNK
+    buffer = bytearray()
+    video = None
+    eof = False
+    try:
+        while video is None:
+            while not eof and len(buffer) < chunk_size:
+                piece = pieces.get()
+                if piece is None:
+                    eof = True
+                elif isinstance(piece, Exception):
+                    raise piece
+                else:
+                    buffer += piece
+            if not buffer:
+                raise RelayError(f"Drive stream ended at {offset} of {size} bytes")
+            # Non-final chunks must be a multiple of 256KB
+            take = len(buffer) if eof else len(buffer) // CHUNK_UNIT * CHUNK_UNIT
+            chunk = buffer[:take]
+            sent = time.time()
+            next_offset, video = _send_chunk(youtube, upload_uri, chunk, offset, size, stats)
+            chunk_size = _next_chunk_size(take, time.time() - sent)
+            del buffer[:next_offset - offset]
+            offset = next_offset
+    except SessionLost:
+        sessions.delete(key)
+        sessions.save()
+        raise
+    finally:
+        stop.set()
+        # Unblock the reader if it is waiting on a full queue
+        while reader.is_alive():
+            try:
+                pieces.get_nowait()
+            except queue.Empty:
+                reader.join(0.1)
+
+    sessions.delete(key)
+    sessions.save()
+    elapsed = max(time.time() - start_time, 0.001)
+    mb = (size - resumed_from) / (1024 * 1024)
+    print(f"📡 Relayed {mb:.1f}MB from Drive to YouTube in {elapsed:.1f}s ({mb / elapsed:.2f} MB/s, "
+          f"{stats['drive_retries']} Drive / {stats['youtube_retries']} YouTube retries)")
+    upload_log.set(video['id'], dict(stats, file_id=file_id, size=size, resumed_from=resumed_from,
+                                     seconds=round(elapsed, 1), mb_per_s=round(mb / elapsed, 2)))
+    upload_log.save()
+    return video['id']